@@ -5,6 +5,7 @@ from flask_login import LoginManager
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_wtf.csrf import CSRFProtect
+from app.utils.database import engine_options, configure_sqlite, sqlite_pragmas
 
 # Extensiones
 db = SQLAlchemy()
@@ -21,37 +22,176 @@ def create_app():
 
     # Configuración básica
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', os.urandom(24))
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///tut0hub.db'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///tut0hub.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # SQLite en producción: PRAGMA aplicados en cada conexión y pool del engine
+    app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+    app.config['SQLITE_CACHE_SIZE'] = int(os.environ.get('SQLITE_CACHE_SIZE', -20000))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 268435456))
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 3600))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config, app.config['SQLALCHEMY_DATABASE_URI'])
     app.config['YOUTUBE_API_KEY'] = os.environ.get('YOUTUBE_API_KEY', '')
 
+    # Cliente HTTP de YouTube (pool keep-alive, timeouts y reintentos)
+    app.config['YOUTUBE_API_BASE'] = os.environ.get('YOUTUBE_API_BASE', 'https://www.googleapis.com/youtube/v3')
+    app.config['YOUTUBE_POOL_SIZE'] = int(os.environ.get('YOUTUBE_POOL_SIZE', 10))
+    app.config['YOUTUBE_CONNECT_TIMEOUT'] = float(os.environ.get('YOUTUBE_CONNECT_TIMEOUT', 3.05))
+    app.config['YOUTUBE_READ_TIMEOUT'] = float(os.environ.get('YOUTUBE_READ_TIMEOUT', 10))
+    app.config['YOUTUBE_MAX_RETRIES'] = int(os.environ.get('YOUTUBE_MAX_RETRIES', 2))
+    app.config['YOUTUBE_BREAKER_ERROR_RATE'] = float(os.environ.get('YOUTUBE_BREAKER_ERROR_RATE', 0.5))
+    app.config['YOUTUBE_BREAKER_MIN_CALLS'] = int(os.environ.get('YOUTUBE_BREAKER_MIN_CALLS', 10))
+    app.config['YOUTUBE_BREAKER_WINDOW'] = int(os.environ.get('YOUTUBE_BREAKER_WINDOW', 60))
+    app.config['YOUTUBE_BREAKER_COOLDOWN'] = int(os.environ.get('YOUTUBE_BREAKER_COOLDOWN', 30))
+    app.config['YOUTUBE_SINGLEFLIGHT_TIMEOUT'] = float(os.environ.get('YOUTUBE_SINGLEFLIGHT_TIMEOUT', 15))
+
+    # Planificador de cuota (unidades diarias, QPS y reserva para trabajo en segundo plano), global entre workers
+    app.config['YOUTUBE_DAILY_QUOTA'] = int(os.environ.get('YOUTUBE_DAILY_QUOTA', 10000))
+    app.config['YOUTUBE_BACKGROUND_RESERVE'] = int(os.environ.get('YOUTUBE_BACKGROUND_RESERVE', 2000))
+    app.config['YOUTUBE_MAX_QPS'] = float(os.environ.get('YOUTUBE_MAX_QPS', 5))
+    app.config['YOUTUBE_QPS_BURST'] = int(os.environ.get('YOUTUBE_QPS_BURST', 10))
+
+    # Caché de respuestas de YouTube (memoria + SQLite compartido en instance/)
+    app.config['YOUTUBE_CACHE_DB'] = os.environ.get('YOUTUBE_CACHE_DB', 'youtube_cache.db')
+    app.config['YOUTUBE_CACHE_TTL'] = int(os.environ.get('YOUTUBE_CACHE_TTL', 900))
+    app.config['YOUTUBE_CACHE_VIDEO_TTL'] = int(os.environ.get('YOUTUBE_CACHE_VIDEO_TTL', 3600))
+    app.config['YOUTUBE_CACHE_MAX_ENTRIES'] = int(os.environ.get('YOUTUBE_CACHE_MAX_ENTRIES', 512))
+    app.config['YOUTUBE_CACHE_STALE_TTL'] = int(os.environ.get('YOUTUBE_CACHE_STALE_TTL', 86400))
+    app.config['YOUTUBE_CACHE_STATS_TTL'] = int(os.environ.get('YOUTUBE_CACHE_STATS_TTL', 3600))
+    app.config['YOUTUBE_CACHE_STATS_MAX_ENTRIES'] = int(os.environ.get('YOUTUBE_CACHE_STATS_MAX_ENTRIES', 4096))
+
+    # Índice local FTS5 de videos vistos (búsquedas repetidas y dentro de favoritos)
+    app.config['VIDEO_INDEX_DB'] = os.environ.get('VIDEO_INDEX_DB', 'video_index.db')
+    app.config['LOCAL_SEARCH_MIN_RESULTS'] = int(os.environ.get('LOCAL_SEARCH_MIN_RESULTS', 12))
+
+    # Hash de contraseñas: pool acotado y coste bcrypt (calibrado si BCRYPT_ROUNDS no se fija)
+    app.config['BCRYPT_ROUNDS'] = int(os.environ.get('BCRYPT_ROUNDS', 0))
+    app.config['BCRYPT_TARGET_MS'] = int(os.environ.get('BCRYPT_TARGET_MS', 250))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+    app.config['PASSWORD_HASH_QUEUE_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5))
+
+    # CAPTCHA de registro: vigencia del token y tokens usados recordados
+    app.config['CAPTCHA_TTL'] = int(os.environ.get('CAPTCHA_TTL', 300))
+    app.config['CAPTCHA_REPLAY_MAX_ENTRIES'] = int(os.environ.get('CAPTCHA_REPLAY_MAX_ENTRIES', 10000))
+
+    # Caché de identidad del user_loader
+    app.config['IDENTITY_CACHE_TTL'] = int(os.environ.get('IDENTITY_CACHE_TTL', 300))
+    app.config['IDENTITY_CACHE_LOCAL_TTL'] = int(os.environ.get('IDENTITY_CACHE_LOCAL_TTL', 5))
+    app.config['IDENTITY_CACHE_MAX_ENTRIES'] = int(os.environ.get('IDENTITY_CACHE_MAX_ENTRIES', 2048))
+
+    # Caché de IDs de favoritos por usuario (compartido entre workers)
+    app.config['FAVORITES_CACHE_MAX_ENTRIES'] = int(os.environ.get('FAVORITES_CACHE_MAX_ENTRIES', 1024))
+    app.config['FAVORITES_CACHE_TTL'] = int(os.environ.get('FAVORITES_CACHE_TTL', 3600))
+    app.config['FAVORITES_CACHE_SHARED_MAX_ENTRIES'] = int(os.environ.get('FAVORITES_CACHE_SHARED_MAX_ENTRIES', 10000))
+
+    # Tendencias precalculadas en segundo plano (0 = consulta en vivo)
+    app.config['TRENDING_REFRESH_INTERVAL'] = int(os.environ.get('TRENDING_REFRESH_INTERVAL', 1800))
+    app.config['TRENDING_QUERY'] = os.environ.get('TRENDING_QUERY', 'tutorial web development')
+    app.config['TRENDING_MAX_RESULTS'] = int(os.environ.get('TRENDING_MAX_RESULTS', 24))
+    # Con gunicorn (preload) el hilo se arranca en cada worker tras el fork
+    app.config['TRENDING_REFRESH_AUTOSTART'] = os.environ.get('TRENDING_REFRESH_AUTOSTART', '1') != '0'
+
+    # Límites de peticiones compartidos entre workers (SQLite en instance/, ventana deslizante)
+    # RATELIMIT_STORAGE_URI=memory:// vuelve a los contadores por proceso
+    os.makedirs(app.instance_path, exist_ok=True)
+    default_limits_uri = 'sqlite:///' + os.path.join(app.instance_path, 'ratelimit.db')
+    app.config['RATELIMIT_STORAGE_URI'] = os.environ.get('RATELIMIT_STORAGE_URI', default_limits_uri)
+    app.config['RATELIMIT_STRATEGY'] = os.environ.get('RATELIMIT_STRATEGY', 'moving-window')
+    app.config['RATELIMIT_IN_MEMORY_FALLBACK_ENABLED'] = True
+
+    # Métricas de Prometheus en /metrics (totales acumulados en el almacén compartido)
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') != '0'
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN', '')
+    # Sin token /metrics se deniega; METRICS_ALLOW_LOOPBACK=1 lo abre a 127.0.0.1 (no usar detrás de un proxy local)
+    app.config['METRICS_ALLOW_LOOPBACK'] = os.environ.get('METRICS_ALLOW_LOOPBACK', '0') == '1'
+    app.config['METRICS_FLUSH_INTERVAL'] = int(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+    # Segundos tras los que se borra la copia de gauges de un worker que no la actualiza
+    app.config['METRICS_RETENTION'] = int(os.environ.get('METRICS_RETENTION', 3600))
+
+    # Perfilado bajo demanda (cabecera X-Profile con el token o muestreo) y administradores
+    app.config['PROFILER_TOKEN'] = os.environ.get('PROFILER_TOKEN', '')
+    app.config['PROFILER_SAMPLE_RATE'] = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+    app.config['PROFILER_MAX_FILES'] = int(os.environ.get('PROFILER_MAX_FILES', 200))
+    app.config['ADMIN_USERS'] = [name.strip() for name in os.environ.get('ADMIN_USERS', '').split(',') if name.strip()]
+
     # Inicializar extensiones
+    # Métricas y perfilado primero: sus hooks cubren también límites y CSRF
+    from app.services.metrics import metrics
+    metrics.init_app(app)
+    from app.services.profiler import request_profiler
+    request_profiler.init_app(app)
     db.init_app(app)
     login_manager.init_app(app)
+    from app.utils import limiter_storage  # noqa: F401 (registra el esquema sqlite:// en limits)
     limiter.init_app(app)
     csrf.init_app(app)
 
     login_manager.login_view = 'auth.login'
 
+    from app.services.cache_service import init_caches
+    from app.services.youtube_client import youtube_client
+    from app.services.quota_scheduler import quota_scheduler
+    from app.services.trending_service import trending_refresher
+    from app.services.video_index import video_index
+    from app.services.favorites_service import favorite_ids_cache
+    from app.utils.captcha import captcha_replay_cache
+    from app.services.password_hasher import password_hasher
+    from app.services.identity_cache import identity_cache
+    init_caches(app)
+    favorite_ids_cache.init_app(app)
+    captcha_replay_cache.init_app(app)
+    password_hasher.init_app(app)
+    identity_cache.init_app(app)
+    video_index.init_app(app)
+    quota_scheduler.init_app(app)
+    youtube_client.init_app(app)
+    trending_refresher.init_app(app)
+
     # Cargar usuario
-    from app.models.user import User
+    from app.models.user import Favorite
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return identity_cache.load(user_id)
 
-    # Crear tablas
+    # Esquema: PRAGMA por conexión y migraciones pendientes
     with app.app_context():
-        db.create_all()
+        configure_sqlite(db.engine, sqlite_pragmas(app.config))
+        metrics.instrument_engine(db.engine)
+        from app.models.migrations import run_migrations
+        run_migrations()
+
+        # Índice recién creado: cargar los favoritos existentes
+        if video_index.created:
+            video_index.backfill_favorites(
+                (fav.user_id, {'id': fav.video_id, 'title': fav.title, 'channel': fav.channel,
+                               'description': fav.description, 'thumbnail': fav.thumbnail})
+                for fav in Favorite.query.yield_per(500)
+            )
+
+    # Filtros de plantillas
+    from app.utils.formatting import format_count, format_duration
+    app.add_template_filter(format_count, 'compact_count')
+    app.add_template_filter(format_duration, 'duration')
 
     # Blueprints
     from app.controllers.auth_controller import auth_bp
     from app.controllers.home_controller import home_bp
     from app.controllers.search_controller import search_bp
+    from app.controllers.metrics_controller import metrics_bp
+    from app.controllers.admin_controller import admin_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(home_bp)
     app.register_blueprint(search_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(admin_bp)
 
     # ==========================
     # Manejadores de errores
@@ -0,0 +1,43 @@
+# ==================================================
+# ARCHIVO: app/controllers/admin_controller.py
+# ==================================================
+
+from functools import wraps
+from flask import Blueprint, Response, jsonify, request, current_app, abort
+from flask_login import login_required, current_user
+from app.services.profiler import request_profiler
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+def admin_required(view):
+    """Solo usuarios listados en ADMIN_USERS"""
+    @wraps(view)
+    @login_required
+    def wrapper(*args, **kwargs):
+        if current_user.username not in current_app.config.get('ADMIN_USERS', ()):
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
+
+@admin_bp.route('/profiles')
+@admin_required
+def profiles():
+    """Perfiles capturados, del más lento al más rápido"""
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    return jsonify({
+        'enabled': request_profiler.enabled,
+        'sample_rate': request_profiler.sample_rate,
+        'profiles': request_profiler.list_profiles(limit),
+    })
+
+@admin_bp.route('/profiles/<name>')
+@admin_required
+def profile_report(name):
+    """Resumen de pstats de un perfil (?sort=cumulative|tottime|calls)"""
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'calls'):
+        sort = 'cumulative'
+    report = request_profiler.report(name, sort=sort)
+    if report is None:
+        abort(404)
+    return Response(report, mimetype='text/plain')
@@ -2,7 +2,9 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_user, logout_user, current_user
 from app import db, limiter
 from app.models.user import User
-from app.utils.captcha import SimpleCaptcha, CaptchaStore
+from app.utils.captcha import issue_captcha, verify_captcha
+from app.services.password_hasher import password_hasher, PasswordHasherBusy
+from app.services.identity_cache import identity_cache
 from email_validator import validate_email, EmailNotValidError
 from sqlalchemy.exc import IntegrityError
 import re
@@ -35,7 +37,25 @@ def login():
         
         user = User.query.filter((User.username == username) | (User.email == username)).first()
         
-        if user and user.check_password(password):
+        try:
+            if user is None:
+                # Mismo coste que con un usuario real: el tiempo de respuesta no revela si existe
+                password_hasher.dummy_verify(password)
+                valid = False
+            else:
+                valid = user.check_password(password)
+        except PasswordHasherBusy:
+            flash('El servicio está ocupado. Intenta de nuevo en unos segundos.', 'danger')
+            return render_template('auth/login.html'), 503
+        
+        if valid:
+            # Hash con otro coste (calibración distinta): se rehace con la contraseña ya verificada
+            if user.password_needs_rehash():
+                try:
+                    user.set_password(password)
+                    db.session.commit()
+                except PasswordHasherBusy:
+                    pass
             login_user(user)
             flash('¡Bienvenido!', 'success')
             return redirect(url_for('home.dashboard'))
@@ -51,8 +71,7 @@ def register():
     
     # Generar CAPTCHA para GET request
     if request.method == 'GET':
-        captcha_question, captcha_answer, captcha_token = SimpleCaptcha.generate()
-        CaptchaStore.save(captcha_token, captcha_answer)
+        captcha_question, captcha_token = issue_captcha()
         session['captcha_token'] = captcha_token
         
         return render_template('auth/register.html', 
@@ -67,24 +86,19 @@ def register():
     captcha_token = session.get('captcha_token', '')
     
     # Generar nuevo CAPTCHA para mostrar en caso de error
-    new_captcha_question, new_captcha_answer, new_captcha_token = SimpleCaptcha.generate()
-    CaptchaStore.save(new_captcha_token, new_captcha_answer)
+    new_captcha_question, new_captcha_token = issue_captcha()
     session['captcha_token'] = new_captcha_token
     
     # ==========================================
     # VALIDACIONES EN BACKEND
     # ==========================================
     
-    # 1. Validar CAPTCHA (Verificación humana)
-    stored_answer = CaptchaStore.get(captcha_token)
-    if not stored_answer or not SimpleCaptcha.validate(captcha_answer, stored_answer):
+    # 1. Validar CAPTCHA (Verificación humana; el token queda usado)
+    if not verify_captcha(captcha_token, captcha_answer):
         flash('CAPTCHA incorrecto. Por favor, intenta de nuevo.', 'danger')
         return render_template('auth/register.html', 
                              captcha_question=new_captcha_question)
     
-    # Limpiar CAPTCHA usado
-    CaptchaStore.delete(captcha_token)
-    
     # 2. Validar campos requeridos
     if not username or not email or not password or not password_confirm:
         flash('Todos los campos son requeridos', 'danger')
@@ -195,6 +209,8 @@ def register():
 
 @auth_bp.route('/logout')
 def logout():
+    if current_user.is_authenticated:
+        identity_cache.invalidate(current_user.id)
     logout_user()
     flash('Sesión cerrada', 'info')
     return redirect(url_for('auth.login'))
\ No newline at end of file
@@ -2,14 +2,28 @@
 # ARCHIVO: app/controllers/home_controller.py
 # ==================================================
 
-from flask import Blueprint, render_template, redirect, url_for, jsonify, request
+from datetime import datetime
+from flask import Blueprint, render_template, redirect, url_for, jsonify, request, Response, stream_with_context
 from flask_login import login_required, current_user
-from app.services.youtube_service import search_videos, get_trending_videos
+from sqlalchemy.exc import IntegrityError
+from app.services.youtube_service import search_videos, get_trending_videos, enrich_videos, search_local
+from app.services.video_index import video_index
+from app.services.trending_service import trending_refresher
+from app.services.quota_scheduler import quota_scheduler
+from app.services.youtube_client import youtube_client
 from app import db
 from app.models.user import Favorite
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.streaming import stream_page, deferred
+from app.services.favorites_service import (get_favorite_ids, favorite_ids_cache, export_favorites,
+                                            import_favorites, VIDEO_ID_RE)
 
 home_bp = Blueprint('home', __name__)
 
+FAVORITES_CURSOR_SALT = 'favorites-cursor'
+FAVORITES_PAGE_SIZE = 24
+FAVORITES_BATCH_MAX = 100
+
 @home_bp.route('/')
 def index():
     if current_user.is_authenticated:
@@ -19,25 +33,117 @@ def index():
 @home_bp.route('/dashboard')
 @login_required
 def dashboard():
-    videos = get_trending_videos(max_results=12)
-    favorite_ids = [fav.video_id for fav in current_user.favorites]
-    return render_template('home/dashboard.html', videos=videos, favorite_ids=favorite_ids, page_title='Dashboard')
+    # Streaming: la cabecera sale antes de consultar tendencias y estadísticas
+    def results():
+        videos = enrich_videos(get_trending_videos(max_results=12))
+        return {'videos': videos, 'favorite_ids': get_favorite_ids(current_user.id)}
+    return stream_page('home/dashboard.html', results=deferred(results, videos=[], favorite_ids=frozenset()),
+                       page_title='Dashboard')
+
+@home_bp.route('/trending/status')
+@login_required
+def trending_status():
+    """Edad del snapshot de tendencias y resultado del último refresco"""
+    return jsonify(trending_refresher.status())
+
+@home_bp.route('/quota/status')
+@login_required
+def quota_status():
+    """Cuota de YouTube restante hoy y gasto por endpoint"""
+    return jsonify(quota_scheduler.status())
+
+@home_bp.route('/upstream/status')
+@login_required
+def upstream_status():
+    """Métricas por endpoint de la API (latencia, bytes, tasa de 304) y estado del circuito"""
+    return jsonify({'endpoints': youtube_client.stats(), 'breaker': youtube_client.breaker.stats()})
 
 @home_bp.route('/favorites')
 @login_required
 def favorites():
-    favorite_records = Favorite.query.filter_by(user_id=current_user.id).all()
-    videos = []
-    for fav in favorite_records:
-        videos.append({
-            'id': fav.video_id,
-            'title': fav.title,
-            'thumbnail': fav.thumbnail or '',
-            'channel': fav.channel or '',
-            'description': fav.description or ''
-        })
-    favorite_ids = [fav.video_id for fav in current_user.favorites]
-    return render_template('home/dashboard.html', videos=videos, favorite_ids=favorite_ids, page_title='Favoritos')
+    favorites_query = request.args.get('q', '').strip()[:100]
+    page = 1
+    next_url = prev_url = None
+    
+    if favorites_query:
+        # Búsqueda dentro de los favoritos, resuelta en el índice local
+        videos = search_local(favorites_query, max_results=200, user_id=current_user.id)
+    else:
+        cursor = decode_cursor(request.args.get('cursor'), FAVORITES_CURSOR_SALT) or {}
+        page = cursor.get('n', 1)
+        records, first, last, has_next, has_prev = _favorites_page(cursor, FAVORITES_PAGE_SIZE)
+        videos = [_favorite_to_video(fav) for fav in records]
+        if has_next:
+            next_url = url_for('home.favorites', cursor=_favorites_cursor(last, 'after', page + 1))
+        if has_prev:
+            prev_url = (url_for('home.favorites', cursor=_favorites_cursor(first, 'before', page - 1))
+                        if page > 2 else url_for('home.favorites'))
+    
+    videos = enrich_videos(videos)
+    favorite_ids = get_favorite_ids(current_user.id)
+    return render_template('home/dashboard.html', videos=videos, favorite_ids=favorite_ids, page_title='Favoritos',
+                          favorites_query=favorites_query, page=page, next_url=next_url, prev_url=prev_url)
+
+@home_bp.route('/favorites/page')
+@login_required
+def favorites_page():
+    """
+    Una página de favoritos en JSON
+    Parámetros: cursor (opcional, de una respuesta anterior) y limit (1-100)
+    Retorna: JSON con videos y next_cursor (null en la última página)
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', FAVORITES_PAGE_SIZE)), 1), 100)
+    except ValueError:
+        limit = FAVORITES_PAGE_SIZE
+    
+    cursor = decode_cursor(request.args.get('cursor'), FAVORITES_CURSOR_SALT) or {}
+    if cursor.get('d') == 'before':
+        # El JSON solo avanza: un cursor hacia atrás se trata como la primera página
+        cursor = {}
+    page = cursor.get('n', 1)
+    records, first, last, has_next, has_prev = _favorites_page(cursor, limit)
+    return jsonify({
+        'videos': [dict(_favorite_to_video(fav), added_at=fav.created_at.isoformat() + 'Z') for fav in records],
+        'next_cursor': _favorites_cursor(last, 'after', page + 1) if has_next else None
+    })
+
+def _favorites_page(cursor, limit):
+    """
+    Favoritos de la página indicada por el cursor
+    Retorna (favoritos, primero, último, hay_siguiente, hay_anterior)
+    """
+    key = None
+    if cursor.get('c') and cursor.get('i'):
+        try:
+            key = (datetime.fromisoformat(cursor['c']), cursor['i'])
+        except (TypeError, ValueError):
+            cursor = {}
+    
+    if key is not None and cursor.get('d') == 'before':
+        records, has_prev = Favorite.keyset_page(current_user.id, limit, before=key)
+        has_next = True
+    else:
+        records, has_next = Favorite.keyset_page(current_user.id, limit, after=key)
+        has_prev = key is not None
+    
+    first = records[0] if records else None
+    last = records[-1] if records else None
+    return records, first, last, has_next and last is not None, has_prev and first is not None
+
+def _favorites_cursor(favorite, direction, number):
+    """Cursor firmado con la clave (created_at, id) del favorito de referencia"""
+    return encode_cursor({'c': favorite.created_at.isoformat(), 'i': favorite.id, 'd': direction, 'n': number},
+                         FAVORITES_CURSOR_SALT)
+
+def _favorite_to_video(fav):
+    return {
+        'id': fav.video_id,
+        'title': fav.title,
+        'thumbnail': fav.thumbnail or '',
+        'channel': fav.channel or '',
+        'description': fav.description or ''
+    }
 
 @home_bp.route('/toggle-favorite/<video_id>', methods=['POST'])
 @login_required
@@ -45,25 +151,145 @@ def toggle_favorite(video_id):
     """
     Agrega o elimina un video de favoritos
     Recibe: video_id en URL y datos del video en JSON
-    Retorna: JSON con success: true
+    Retorna: JSON con success: true y favorited con el estado final
     """
-    existing = Favorite.query.filter_by(user_id=current_user.id, video_id=video_id).first()
+    # Borrado e inserción atómicos: el índice único evita duplicados aunque
+    # lleguen dos peticiones a la vez
+    removed = Favorite.query.filter_by(user_id=current_user.id, video_id=video_id).delete()
     
-    if existing:
-        # Si ya existe, eliminarlo
-        db.session.delete(existing)
-    else:
-        # Si no existe, agregarlo
-        data = request.get_json()
-        favorite = Favorite(
-            user_id=current_user.id,
-            video_id=video_id,
-            title=data.get('title', ''),
-            channel=data.get('channel', ''),
-            description=data.get('description', ''),
-            thumbnail=data.get('thumbnail', '')
-        )
-        db.session.add(favorite)
+    if removed:
+        db.session.commit()
+        favorite_ids_cache.apply(current_user.id, removed=[video_id])
+        video_index.remove_favorites(current_user.id, [video_id])
+        return jsonify({'success': True, 'favorited': False})
+    
+    data = request.get_json(silent=True) or {}
+    favorite = Favorite(
+        user_id=current_user.id,
+        video_id=video_id,
+        title=data.get('title', ''),
+        channel=data.get('channel', ''),
+        description=data.get('description', ''),
+        thumbnail=data.get('thumbnail', '')
+    )
+    db.session.add(favorite)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Otra petición concurrente ya lo agregó
+        db.session.rollback()
+        favorite_ids_cache.apply(current_user.id, added=[video_id])
+        return jsonify({'success': True, 'favorited': True})
+    
+    favorite_ids_cache.apply(current_user.id, added=[video_id])
+    video_index.add_favorites(current_user.id, [{
+        'id': video_id, 'title': favorite.title, 'channel': favorite.channel,
+        'description': favorite.description, 'thumbnail': favorite.thumbnail
+    }])
+    return jsonify({'success': True, 'favorited': True})
+
+@home_bp.route('/favorites/batch', methods=['POST'])
+@login_required
+def batch_favorites():
+    """
+    Aplica varias altas y bajas de favoritos en una sola transacción
+    Recibe: JSON {"ops": [{"video_id", "action": "add"|"remove", title, channel, description, thumbnail}]}
+    Si un video aparece varias veces, cuenta la última operación
+    Retorna: JSON con success y favorites {video_id: favorito} con el estado final
+    """
+    data = request.get_json(silent=True) or {}
+    ops = data.get('ops')
+    if not isinstance(ops, list) or not ops or len(ops) > FAVORITES_BATCH_MAX:
+        return jsonify({'success': False, 'error': f'Se esperan entre 1 y {FAVORITES_BATCH_MAX} operaciones'}), 400
+    
+    final = {}
+    for op in ops:
+        if not isinstance(op, dict) or op.get('action') not in ('add', 'remove'):
+            return jsonify({'success': False, 'error': 'Operación inválida'}), 400
+        video_id = op.get('video_id')
+        if not isinstance(video_id, str) or not VIDEO_ID_RE.match(video_id):
+            return jsonify({'success': False, 'error': 'ID de video inválido'}), 400
+        final.pop(video_id, None)
+        final[video_id] = op
+    
+    to_remove = [video_id for video_id, op in final.items() if op['action'] == 'remove']
+    to_add = {video_id: op for video_id, op in final.items() if op['action'] == 'add'}
+    
+    # Si una petición concurrente inserta el mismo favorito, se reintenta una vez
+    for attempt in range(2):
+        try:
+            removed, added = _apply_favorite_ops(current_user.id, to_remove, to_add)
+            break
+        except IntegrityError:
+            db.session.rollback()
+            if attempt:
+                return jsonify({'success': False, 'error': 'Conflicto al guardar favoritos'}), 409
+    
+    if removed or added:
+        favorite_ids_cache.apply(current_user.id, added=[video['id'] for video in added], removed=removed)
+    if removed:
+        video_index.remove_favorites(current_user.id, removed)
+    if added:
+        video_index.add_favorites(current_user.id, added)
+    
+    return jsonify({'success': True, 'favorites': {video_id: op['action'] == 'add' for video_id, op in final.items()}})
+
+def _apply_favorite_ops(user_id, to_remove, to_add):
+    """
+    Bajas y altas en un único commit
+    Retorna (IDs eliminados, videos agregados) para actualizar cachés e índice
+    """
+    removed = []
+    if to_remove:
+        removed = [video_id for video_id, in db.session.query(Favorite.video_id).filter(
+            Favorite.user_id == user_id, Favorite.video_id.in_(to_remove))]
+        if removed:
+            Favorite.query.filter(Favorite.user_id == user_id, Favorite.video_id.in_(removed)) \
+                .delete(synchronize_session=False)
+    
+    added = []
+    if to_add:
+        existing = {video_id for video_id, in db.session.query(Favorite.video_id).filter(
+            Favorite.user_id == user_id, Favorite.video_id.in_(list(to_add)))}
+        for video_id, op in to_add.items():
+            if video_id in existing:
+                continue
+            favorite = Favorite(
+                user_id=user_id,
+                video_id=video_id,
+                title=str(op.get('title') or '')[:200],
+                channel=str(op.get('channel') or '')[:200],
+                description=str(op.get('description') or ''),
+                thumbnail=str(op.get('thumbnail') or '')[:500]
+            )
+            db.session.add(favorite)
+            added.append({'id': video_id, 'title': favorite.title, 'channel': favorite.channel,
+                          'description': favorite.description, 'thumbnail': favorite.thumbnail})
     
     db.session.commit()
-    return jsonify({'success': True})
\ No newline at end of file
+    return removed, added
+
+@home_bp.route('/favorites/export')
+@login_required
+def export_favorites_ndjson():
+    """
+    Descarga todos los favoritos del usuario en NDJSON (una línea JSON por favorito)
+    La respuesta se genera por bloques mientras se envía
+    """
+    filename = f'favoritos-{datetime.utcnow():%Y%m%d}.ndjson'
+    return Response(stream_with_context(export_favorites(current_user.id)),
+                    mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@home_bp.route('/favorites/import', methods=['POST'])
+@login_required
+def import_favorites_ndjson():
+    """
+    Importa favoritos desde NDJSON (cuerpo de la petición o archivo 'file')
+    Cada línea: {"video_id", "title", "channel", "description", "thumbnail", "added_at"}
+    Retorna: JSON con success y contadores de leídos, importados, duplicados e inválidos
+    """
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    result = import_favorites(current_user.id, stream)
+    return jsonify(dict(result, success=True))
@@ -0,0 +1,32 @@
+# ==================================================
+# ARCHIVO: app/controllers/metrics_controller.py
+# ==================================================
+
+import hmac
+from flask import Blueprint, Response, request, current_app, abort
+from app import limiter
+from app.services.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+LOOPBACK = {'127.0.0.1', '::1'}
+
+@metrics_bp.route('/metrics')
+@limiter.exempt
+def prometheus():
+    """
+    Métricas en formato de texto de Prometheus
+    Con METRICS_TOKEN se exige 'Authorization: Bearer <token>'. Sin token se
+    deniega, salvo que METRICS_ALLOW_LOOPBACK permita las peticiones locales:
+    detrás de un proxy en la misma máquina todas llegan desde 127.0.0.1
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8')):
+            abort(403)
+    elif not (current_app.config.get('METRICS_ALLOW_LOOPBACK') and request.remote_addr in LOOPBACK):
+        abort(403)
+
+    return Response(metrics.render(), mimetype='text/plain',
+                    headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
@@ -3,20 +3,61 @@
 # ACCIÓN: REEMPLAZAR TODO EL CONTENIDO
 # ==================================================
 
-from flask import Blueprint, render_template, request, flash
+from flask import Blueprint, render_template, request, flash, url_for, current_app
 from flask_login import login_required, current_user
-from app.services.youtube_service import search_videos, advanced_search_videos
-from app.models.user import Favorite
+from app.services.youtube_service import (search_videos, advanced_search_videos, iter_search_pages, enrich_videos,
+                                          search_local)
+from app.services.cache_service import make_cache_key
+from app.services.favorites_service import get_favorite_ids
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.streaming import stream_page, deferred
 import re
 
 search_bp = Blueprint('search', __name__, url_prefix='/search')
 
+CURSOR_SALT = 'search-cursor'
+PAGE_SIZE = 12
+
+def _read_cursor(scope):
+    """
+    Contenido del cursor recibido: token de YouTube ('t') o desplazamiento local ('o')
+    y número de página ('n'). Un cursor de otra búsqueda (scope distinto) se ignora
+    """
+    payload = decode_cursor(request.args.get('cursor'), CURSOR_SALT)
+    if not payload or payload.get('s') != scope:
+        return {}
+    return payload
+
+def _local_link(scope, offset, number, **params):
+    """URL de una página de resultados del índice local"""
+    if number == 1:
+        return url_for(request.endpoint, **params)
+    cursor = encode_cursor({'s': scope, 'o': offset, 'n': number}, CURSOR_SALT)
+    return url_for(request.endpoint, cursor=cursor, **params)
+
+def _page_links(videos, scope, page, next_extra=None, **params):
+    """
+    URLs de página siguiente y anterior con cursores opacos
+    next_extra: campos adicionales para el cursor de la página siguiente
+    """
+    def link(token, number, extra=None):
+        if number == 1:
+            return url_for(request.endpoint, **params)
+        cursor = encode_cursor(dict(extra or {}, s=scope, t=token, n=number), CURSOR_SALT)
+        return url_for(request.endpoint, cursor=cursor, **params)
+    
+    next_url = (link(videos.next_page_token, page + 1, next_extra)
+                if getattr(videos, 'next_page_token', None) else None)
+    prev_url = None
+    if page > 1 and (page == 2 or getattr(videos, 'prev_page_token', None)):
+        prev_url = link(getattr(videos, 'prev_page_token', None), page - 1)
+    return next_url, prev_url
+
 @search_bp.route('/')
 @login_required
 def search():
     query = request.args.get('q', '').strip()
-    videos = []
-    favorite_ids = []
+    source = request.args.get('source', '')
     
     if query:
         if not re.match(r'^[A-Za-z0-9áéíóúÁÉÍÓÚñÑ\s\-]+$', query):
@@ -31,10 +72,40 @@ def search():
             flash('La búsqueda es demasiado larga (máximo 100 caracteres)', 'danger')
             return render_template('home/search.html', query='', videos=[], favorite_ids=[], page_title='Búsqueda')
         
-        videos = search_videos(query, max_results=12)
-        favorite_ids = [fav.video_id for fav in current_user.favorites]
+        scope = make_cache_key('search', query)[:16]
+        cursor = _read_cursor(scope)
+        
+        # Streaming: la cabecera y el formulario salen antes de buscar
+        def results():
+            page = cursor.get('n', 1)
+            videos = []
+            next_url = prev_url = None
+            local_results = False
+            
+            # Primero el índice local: con suficientes coincidencias no se llama a la API
+            if source != 'youtube' and not cursor.get('t'):
+                offset = cursor.get('o', 0)
+                local = search_local(query, max_results=PAGE_SIZE + 1, offset=offset)
+                if offset or len(local) >= current_app.config.get('LOCAL_SEARCH_MIN_RESULTS', PAGE_SIZE):
+                    local_results = True
+                    videos = local[:PAGE_SIZE]
+                    if len(local) > PAGE_SIZE:
+                        next_url = _local_link(scope, offset + PAGE_SIZE, page + 1, q=query)
+                    if offset:
+                        prev_url = _local_link(scope, max(offset - PAGE_SIZE, 0), page - 1, q=query)
+            
+            if not local_results:
+                params = {'q': query, 'source': source} if source else {'q': query}
+                videos = search_videos(query, max_results=PAGE_SIZE, page_token=cursor.get('t'))
+                next_url, prev_url = _page_links(videos, scope, page, **params)
+            
+            return {'videos': enrich_videos(videos), 'favorite_ids': get_favorite_ids(current_user.id),
+                    'page': page, 'next_url': next_url, 'prev_url': prev_url, 'local_results': local_results}
+        
+        return stream_page('home/search.html', query=query, page_title='Búsqueda',
+                           results=deferred(results, videos=[], favorite_ids=frozenset(), page=cursor.get('n', 1)))
     
-    return render_template('home/search.html', query=query, videos=videos, favorite_ids=favorite_ids, page_title='Búsqueda')
+    return render_template('home/search.html', query=query, videos=[], favorite_ids=[], page_title='Búsqueda')
 
 @search_bp.route('/advanced')
 @login_required
@@ -47,7 +118,7 @@ def advanced_search():
     max_results = request.args.get('max_results', '12').strip()
     
     videos = []
-    favorite_ids = [fav.video_id for fav in current_user.favorites]
+    favorite_ids = get_favorite_ids(current_user.id)
     searched = bool(query or category)
     
     if query:
@@ -77,17 +148,39 @@ def advanced_search():
     if order not in valid_orders:
         order = 'relevance'
     
+    page = 1
+    next_url = prev_url = None
+    results = None
+    
     if searched:
-        videos = advanced_search_videos(
-            query=query,
-            category=category,
-            duration=duration,
-            date_filter=date_filter,
-            order=order,
-            max_results=max_results_int
-        )
+        scope = make_cache_key('advanced', query, category, duration, date_filter, order, max_results_int)[:16]
+        cursor = _read_cursor(scope)
+        
+        # Streaming: el formulario sale antes de consultar la API
+        def results():
+            page = cursor.get('n', 1)
+            filters = {'query': query, 'category': category, 'duration': duration,
+                       'date_filter': date_filter, 'order': order}
+            videos = None
+            if 'p' in cursor:
+                # Avance desde la página anterior ('p' es su token): se recorre desde ella,
+                # que acaba de verse y suele estar en caché, para descartar los videos
+                # que YouTube repite entre páginas consecutivas
+                pages = iter_search_pages(page_size=max_results_int, page_token=cursor['p'], max_pages=2, **filters)
+                next(pages)
+                videos = next(pages, None)
+            if videos is None:
+                videos = advanced_search_videos(max_results=max_results_int, page_token=cursor.get('t'), **filters)
+            videos = enrich_videos(videos)
+            next_url, prev_url = _page_links(videos, scope, page, next_extra={'p': cursor.get('t')},
+                                             q=query, category=category, duration=duration,
+                                             date_filter=date_filter, order=order, max_results=max_results_int)
+            return {'videos': videos, 'page': page, 'next_url': next_url, 'prev_url': prev_url}
+        results = deferred(results, videos=[], page=cursor.get('n', 1))
     
-    return render_template('home/advanced_search.html', 
+    render = stream_page if searched else render_template
+    return render('home/advanced_search.html',
+                          results=results,
                           query=query,
                           category=category,
                           duration=duration,
@@ -97,4 +190,7 @@ def advanced_search():
                           videos=videos, 
                           favorite_ids=favorite_ids,
                           searched=searched,
+                          page=page,
+                          next_url=next_url,
+                          prev_url=prev_url,
                           page_title='Búsqueda Avanzada')
\ No newline at end of file
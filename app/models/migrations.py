@@ -0,0 +1,112 @@
+# ==================================================
+# ARCHIVO: app/models/migrations.py
+# ==================================================
+
+"""
+Migraciones versionadas del esquema (SQLite)
+Cada migración se aplica una sola vez, en orden y dentro de una transacción;
+la tabla schema_version registra las aplicadas. Para cambiar el esquema se
+agrega una migración nueva al final de MIGRATIONS (nunca se edita una aplicada)
+"""
+from datetime import datetime
+
+from app import db
+
+
+def _initial_schema(cursor):
+    # IF NOT EXISTS: las bases creadas antes con create_all ya tienen estas tablas
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER NOT NULL PRIMARY KEY,
+            username VARCHAR(80) NOT NULL UNIQUE,
+            email VARCHAR(120) NOT NULL UNIQUE,
+            password_hash VARCHAR(255) NOT NULL,
+            created_at DATETIME
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS favorites (
+            id INTEGER NOT NULL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            video_id VARCHAR(20) NOT NULL,
+            title VARCHAR(200),
+            thumbnail VARCHAR(500),
+            channel VARCHAR(200),
+            description TEXT,
+            created_at DATETIME
+        )
+    ''')
+
+
+def _unique_favorites(cursor):
+    # Se conserva el favorito más antiguo de cada duplicado
+    cursor.execute('''
+        DELETE FROM favorites WHERE id NOT IN (
+            SELECT MIN(id) FROM favorites GROUP BY user_id, video_id
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS ix_favorites_user_video ON favorites (user_id, video_id)')
+
+
+def _favorites_keyset_index(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_favorites_user_created ON favorites (user_id, created_at, id)')
+
+
+# (versión, descripción, función que recibe un cursor DB-API)
+MIGRATIONS = [
+    (1, 'Esquema inicial: usuarios y favoritos', _initial_schema),
+    (2, 'Favoritos únicos por usuario y video', _unique_favorites),
+    (3, 'Índice de paginación de favoritos', _favorites_keyset_index),
+]
+
+
+def current_version(cursor):
+    """Versión más alta aplicada (0 si la base de datos es nueva)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER NOT NULL PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    ''')
+    cursor.execute('SELECT MAX(version) FROM schema_version')
+    return cursor.fetchone()[0] or 0
+
+
+def run_migrations():
+    """
+    Aplica las migraciones pendientes y retorna la lista de versiones aplicadas
+    Si la base de datos ya está al día solo cuesta una consulta
+    Debe llamarse dentro de un contexto de aplicación
+    """
+    latest = MIGRATIONS[-1][0]
+    applied = []
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if current_version(cursor) >= latest:
+            connection.commit()
+            return applied
+
+        # Lock de escritura: si varios workers arrancan a la vez, solo uno migra
+        # y los demás ven las versiones ya aplicadas al obtener el lock
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            version = current_version(cursor)
+            for number, description, migrate in MIGRATIONS:
+                if number <= version:
+                    continue
+                migrate(cursor)
+                cursor.execute('INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                               (number, description, datetime.utcnow().isoformat(sep=' ')))
+                applied.append(number)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    finally:
+        connection.close()
+
+    for number in applied:
+        print(f"Migración aplicada: {number}")
+    return applied
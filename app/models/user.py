@@ -5,7 +5,7 @@
 from datetime import datetime
 from flask_login import UserMixin
 from app import db
-import bcrypt
+from app.services.password_hasher import password_hasher
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -20,16 +20,25 @@ class User(UserMixin, db.Model):
     favorites = db.relationship('Favorite', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        """Hash de contraseña con bcrypt"""
-        salt = bcrypt.gensalt()
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        """Hash de contraseña con bcrypt (en el pool de hash, con el coste calibrado)"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Verificar contraseña"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return password_hasher.verify(password, self.password_hash)
+    
+    def password_needs_rehash(self):
+        """True si el hash guardado usa un coste distinto del actual"""
+        return password_hasher.needs_rehash(self.password_hash)
 
 class Favorite(db.Model):
     __tablename__ = 'favorites'
+    __table_args__ = (
+        # Un video solo puede estar una vez en los favoritos de cada usuario
+        db.Index('ix_favorites_user_video', 'user_id', 'video_id', unique=True),
+        # Paginación por clave (más recientes primero)
+        db.Index('ix_favorites_user_created', 'user_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -38,4 +47,79 @@ class Favorite(db.Model):
     thumbnail = db.Column(db.String(500))
     channel = db.Column(db.String(200))
     description = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @staticmethod
+    def ids_for(user_id):
+        """IDs de los videos favoritos del usuario (solo la columna video_id, vía índice)"""
+        rows = db.session.query(Favorite.video_id).filter(Favorite.user_id == user_id)
+        return {video_id for video_id, in rows}
+    
+    @staticmethod
+    def keyset_page(user_id, limit, after=None, before=None):
+        """
+        Una página de favoritos ordenada por (created_at, id) descendente
+        after / before son la clave (created_at, id) del último / primer
+        favorito de la página vecina
+        Retorna (favoritos, hay_más) donde hay_más indica si quedan filas
+        más allá de la página en la dirección recorrida
+        """
+        query = Favorite.query.filter(Favorite.user_id == user_id)
+        if before is not None:
+            created_at, favorite_id = before
+            query = query.filter(db.or_(
+                Favorite.created_at > created_at,
+                db.and_(Favorite.created_at == created_at, Favorite.id > favorite_id)
+            )).order_by(Favorite.created_at.asc(), Favorite.id.asc())
+        else:
+            if after is not None:
+                created_at, favorite_id = after
+                query = query.filter(db.or_(
+                    Favorite.created_at < created_at,
+                    db.and_(Favorite.created_at == created_at, Favorite.id < favorite_id)
+                ))
+            query = query.order_by(Favorite.created_at.desc(), Favorite.id.desc())
+        
+        rows = query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if before is not None:
+            rows.reverse()
+        return rows, has_more
+    
+    @staticmethod
+    def iter_rows(user_id, chunk_size=500):
+        """
+        Recorre todos los favoritos del usuario (más antiguos primero) por bloques
+        Solo carga las columnas, sin objetos del ORM, y un bloque cada vez
+        """
+        columns = (Favorite.id, Favorite.video_id, Favorite.title, Favorite.channel,
+                   Favorite.description, Favorite.thumbnail, Favorite.created_at)
+        last = None
+        while True:
+            query = db.session.query(*columns).filter(Favorite.user_id == user_id)
+            if last is not None:
+                query = query.filter(db.or_(
+                    Favorite.created_at > last.created_at,
+                    db.and_(Favorite.created_at == last.created_at, Favorite.id > last.id)
+                ))
+            rows = query.order_by(Favorite.created_at.asc(), Favorite.id.asc()).limit(chunk_size).all()
+            # Cada bloque en su propia transacción de lectura: no bloquea a los escritores
+            db.session.commit()
+            yield from rows
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1]
+    
+    @staticmethod
+    def insert_ignore(rows):
+        """
+        Inserción masiva (executemany) que omite los favoritos ya existentes
+        Recibe dicts con las columnas; retorna cuántas filas se insertaron
+        """
+        if not rows:
+            return 0
+        statement = db.insert(Favorite.__table__).prefix_with('OR IGNORE')
+        result = db.session.execute(statement, rows)
+        db.session.commit()
+        return result.rowcount
@@ -0,0 +1,305 @@
+# ==================================================
+# ARCHIVO: app/services/cache_service.py
+# ==================================================
+
+"""
+Caché de respuestas en dos niveles
+Nivel 1: LRU en memoria del proceso con TTL por entrada
+Nivel 2: SQLite bajo instance/, compartido entre workers y persistente entre reinicios
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(*parts):
+    """
+    Construye una clave estable a partir de parámetros normalizados
+    Los textos se pasan a minúsculas y se colapsan los espacios
+    """
+    normalized = []
+    for part in parts:
+        if isinstance(part, str):
+            part = ' '.join(part.lower().split())
+        normalized.append(part)
+    raw = json.dumps(normalized, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class SharedConnection:
+    """
+    Conexión SQLite por hilo y por proceso hacia un archivo compartido entre workers
+    Nunca reutiliza una conexión heredada a través de un fork
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def get(self):
+        """Conexión del hilo actual en modo autocommit, o None si no hay ruta"""
+        if not self.db_path:
+            return None
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid() and self._local.path == self.db_path:
+            return conn
+
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        except sqlite3.Error as e:
+            print(f"Error abriendo almacén compartido: {e}")
+            return None
+
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        self._local.path = self.db_path
+        return conn
+
+
+def shared_db_path(app):
+    """Ruta del archivo SQLite compartido bajo instance/ (None si está desactivado)"""
+    db_name = app.config.get('YOUTUBE_CACHE_DB')
+    if not db_name:
+        return None
+    os.makedirs(app.instance_path, exist_ok=True)
+    return os.path.join(app.instance_path, db_name)
+
+
+class ResponseCache:
+    """
+    Caché con LRU acotado en memoria delante de una tabla SQLite compartida
+    Los valores deben ser serializables a JSON y tratarse como inmutables
+    Tras expirar, una entrada se conserva stale_ttl segundos más como respaldo
+    (get_entry la devuelve marcada como no fresca)
+    local_ttl limita cuánto vive una entrada en memoria (0 = solo nivel compartido)
+    """
+
+    def __init__(self, namespace, max_entries=512, ttl=900, stale_ttl=0, local_ttl=None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.local_ttl = local_ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = SharedConnection()
+        self._writes = 0
+        self._stats = {
+            'hits': 0,
+            'shared_hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+
+    def init_app(self, app):
+        """Configura el caché a partir de la configuración de la app"""
+        prefix = f'YOUTUBE_CACHE_{self.namespace.upper()}_'
+        self.ttl = app.config.get(prefix + 'TTL', app.config.get('YOUTUBE_CACHE_TTL', self.ttl))
+        self.stale_ttl = app.config.get(prefix + 'STALE_TTL',
+                                        app.config.get('YOUTUBE_CACHE_STALE_TTL', self.stale_ttl))
+        self.max_entries = app.config.get(prefix + 'MAX_ENTRIES',
+                                          app.config.get('YOUTUBE_CACHE_MAX_ENTRIES', self.max_entries))
+
+        self._shared.db_path = shared_db_path(app)
+        self._ensure_schema()
+
+    # ==========================
+    # API pública
+    # ==========================
+    def get(self, key):
+        """Devuelve el valor cacheado o None si no existe o expiró"""
+        entry = self._lookup(key, allow_stale=False)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key):
+        """
+        Devuelve (valor, fresco) incluyendo entradas expiradas dentro de la
+        ventana de respaldo, o None si no hay nada utilizable
+        """
+        return self._lookup(key, allow_stale=True)
+
+    def set(self, key, value, ttl=None):
+        """Guarda un valor en ambos niveles"""
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        stale_until = expires_at + self.stale_ttl
+        with self._lock:
+            self._store_local(key, value, expires_at, stale_until)
+        self._shared_set(key, value, expires_at, stale_until)
+
+    def delete(self, key):
+        """Elimina una entrada de ambos niveles"""
+        with self._lock:
+            self._entries.pop(key, None)
+        conn = self._connection()
+        if conn is not None:
+            try:
+                conn.execute('DELETE FROM cache_entries WHERE namespace = ? AND key = ?',
+                             (self.namespace, key))
+            except sqlite3.Error as e:
+                print(f"Error en caché compartido ({self.namespace}): {e}")
+
+    def clear(self):
+        """Vacía ambos niveles"""
+        with self._lock:
+            self._entries.clear()
+        conn = self._connection()
+        if conn is not None:
+            try:
+                conn.execute('DELETE FROM cache_entries WHERE namespace = ?', (self.namespace,))
+            except sqlite3.Error as e:
+                print(f"Error en caché compartido ({self.namespace}): {e}")
+
+    def stats(self):
+        """Contadores de aciertos, fallos y desalojos"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        return stats
+
+    def _lookup(self, key, allow_stale):
+        now = time.time()
+        stale = None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, stale_until = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return value, True
+                if stale_until > now:
+                    stale = value
+                else:
+                    del self._entries[key]
+                    self._stats['expirations'] += 1
+
+        shared = self._shared_get(key, now)
+        if shared is not None:
+            value, expires_at, stale_until = shared
+            if expires_at > now:
+                with self._lock:
+                    self._stats['shared_hits'] += 1
+                    self._store_local(key, value, expires_at, stale_until)
+                return value, True
+            if stale is None:
+                stale = value
+
+        with self._lock:
+            if allow_stale and stale is not None:
+                self._stats['stale_hits'] += 1
+                return stale, False
+            self._stats['misses'] += 1
+        return None
+
+    # ==========================
+    # Nivel 1: memoria
+    # ==========================
+    def _store_local(self, key, value, expires_at, stale_until):
+        """Inserta en el LRU; el llamador debe tener el lock"""
+        if self.local_ttl is not None:
+            if self.local_ttl <= 0:
+                return
+            local_until = time.time() + self.local_ttl
+            expires_at = min(expires_at, local_until)
+            stale_until = min(stale_until, local_until)
+        self._entries[key] = (value, expires_at, stale_until)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    # ==========================
+    # Nivel 2: SQLite compartido
+    # ==========================
+    def _connection(self):
+        return self._shared.get()
+
+    def _ensure_schema(self):
+        conn = self._connection()
+        if conn is None:
+            return
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(cache_entries)')]
+        if columns and 'stale_until' not in columns:
+            # Formato anterior: el contenido es desechable, se recrea la tabla
+            conn.execute('DROP TABLE cache_entries')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        ''')
+        conn.execute('DROP INDEX IF EXISTS ix_cache_entries_expires')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_entries_stale ON cache_entries (stale_until)')
+
+    def _shared_get(self, key, now):
+        conn = self._connection()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                'SELECT value, expires_at, stale_until FROM cache_entries WHERE namespace = ? AND key = ?',
+                (self.namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error en caché compartido ({self.namespace}): {e}")
+            return None
+
+        if row is None or row[2] <= now:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def _shared_set(self, key, value, expires_at, stale_until):
+        conn = self._connection()
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, stale_until) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (self.namespace, key, json.dumps(value, ensure_ascii=False), expires_at, stale_until)
+            )
+            self._writes += 1
+            # Purga periódica de entradas ya inservibles para acotar el archivo
+            if self._writes % 100 == 0:
+                conn.execute('DELETE FROM cache_entries WHERE stale_until <= ?', (time.time(),))
+        except sqlite3.Error as e:
+            print(f"Error en caché compartido ({self.namespace}): {e}")
+
+
+# Instancias compartidas por el servicio de YouTube
+search_cache = ResponseCache('search', ttl=900)
+video_cache = ResponseCache('video', ttl=3600)
+stats_cache = ResponseCache('stats', max_entries=4096, ttl=3600)
+
+
+def init_caches(app):
+    """Inicializa todos los cachés de respuestas"""
+    search_cache.init_app(app)
+    video_cache.init_app(app)
+    stats_cache.init_app(app)
+
+
+def cache_stats():
+    """Contadores de todos los cachés, por namespace"""
+    return {
+        search_cache.namespace: search_cache.stats(),
+        video_cache.namespace: video_cache.stats(),
+        stats_cache.namespace: stats_cache.stats(),
+    }
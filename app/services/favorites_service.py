@@ -0,0 +1,372 @@
+# ==================================================
+# ARCHIVO: app/services/favorites_service.py
+# ==================================================
+
+"""
+Caché de IDs de favoritos por usuario
+Cada worker guarda en un LRU el conjunto de IDs de los usuarios recientes;
+una tabla SQLite compartida guarda la copia de referencia con un número de
+versión, de modo que un cambio hecho en un worker lo ven todos los demás
+
+También incluye la exportación e importación masiva de favoritos en NDJSON
+(una línea JSON por favorito), por bloques y con memoria constante
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from app.services.cache_service import SharedConnection, shared_db_path
+from app.services.video_index import video_index
+
+# Segundos que se conserva una lápida vencida: más que cualquier carga desde la base de datos
+TOMBSTONE_GRACE = 300
+
+
+def _initial_version():
+    """
+    Versión de una fila nueva: milisegundos del reloj, para que una fila
+    purgada y vuelta a crear no repita una versión que siga en algún LRU
+    """
+    return int(time.time() * 1000)
+
+
+class FavoriteIdsCache:
+    """
+    get() compara la versión local con la compartida (lectura por clave primaria)
+    y solo decodifica el conjunto cuando otro worker lo cambió
+    apply() actualiza la copia compartida tras confirmar el cambio en la base de datos
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, shared_max_entries=10000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_max_entries = shared_max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = SharedConnection()
+        self._writes = 0
+        self._stats = {
+            'hits': 0,
+            'shared_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'updates': 0,
+            'conflicts': 0,
+        }
+
+    def init_app(self, app):
+        """Configura límites y crea la tabla compartida"""
+        self.max_entries = app.config.get('FAVORITES_CACHE_MAX_ENTRIES', self.max_entries)
+        self.ttl = app.config.get('FAVORITES_CACHE_TTL', self.ttl)
+        self.shared_max_entries = app.config.get('FAVORITES_CACHE_SHARED_MAX_ENTRIES', self.shared_max_entries)
+
+        self._shared.db_path = shared_db_path(app)
+        conn = self._shared.get()
+        if conn is not None:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS favorite_ids (
+                    user_id INTEGER PRIMARY KEY,
+                    ids TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+
+    # ==========================
+    # Lectura
+    # ==========================
+    def get(self, user_id, loader):
+        """
+        Conjunto inmutable de IDs favoritos del usuario
+        loader() se llama solo si no hay copia vigente en ningún nivel
+        """
+        now = time.time()
+        conn = self._shared.get()
+        if conn is None:
+            return self._get_local_only(user_id, loader)
+
+        seen_version = None
+        try:
+            row = conn.execute('SELECT version, expires_at FROM favorite_ids WHERE user_id = ?',
+                               (user_id,)).fetchone()
+            if row is not None:
+                seen_version = row[0]
+            if row is not None and row[1] > now:
+                version = row[0]
+                with self._lock:
+                    entry = self._entries.get(user_id)
+                    if entry is not None and entry[0] == version:
+                        self._entries.move_to_end(user_id)
+                        self._stats['hits'] += 1
+                        return entry[1]
+
+                row = conn.execute('SELECT ids, version FROM favorite_ids WHERE user_id = ?',
+                                   (user_id,)).fetchone()
+                if row is None:
+                    seen_version = None
+                else:
+                    ids = frozenset(json.loads(row[0]))
+                    with self._lock:
+                        self._stats['shared_hits'] += 1
+                        self._store_local(user_id, row[1], ids)
+                    return ids
+        except sqlite3.Error as e:
+            print(f"Error en caché de favoritos: {e}")
+            return frozenset(loader())
+
+        # Si apply() cambia la fila mientras loader() lee la base de datos, el
+        # conjunto leído puede ser anterior al cambio y no se guarda
+        ids = frozenset(loader())
+        with self._lock:
+            self._stats['misses'] += 1
+        self._write(conn, user_id, ids, seen_version)
+        return ids
+
+    def _get_local_only(self, user_id, loader):
+        """Sin almacén compartido no hay forma de ver cambios de otros workers: no se cachea"""
+        with self._lock:
+            self._stats['misses'] += 1
+        return frozenset(loader())
+
+    # ==========================
+    # Escritura
+    # ==========================
+    def apply(self, user_id, added=(), removed=()):
+        """Aplica altas y bajas ya confirmadas en la base de datos (write-through)"""
+        conn = self._shared.get()
+        if conn is None or not (added or removed):
+            return
+        try:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute('SELECT ids, expires_at FROM favorite_ids WHERE user_id = ?',
+                                   (user_id,)).fetchone()
+                if row is None or row[1] <= time.time():
+                    # Sin copia vigente: la próxima lectura la cargará de la base de datos.
+                    # La lápida cambia la versión para que no se guarde una carga en curso
+                    self._tombstone(conn, user_id)
+                    ids = None
+                else:
+                    ids = (set(json.loads(row[0])) | set(added)) - set(removed)
+                    version = self._upsert(conn, user_id, ids)
+        except sqlite3.Error as e:
+            print(f"Error en caché de favoritos: {e}")
+            self.invalidate(user_id)
+            return
+
+        with self._lock:
+            if ids is None:
+                self._entries.pop(user_id, None)
+            else:
+                self._store_local(user_id, version, frozenset(ids))
+                self._stats['updates'] += 1
+
+    def invalidate(self, user_id):
+        """Descarta la copia del usuario en ambos niveles"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+        conn = self._shared.get()
+        if conn is not None:
+            try:
+                self._tombstone(conn, user_id)
+            except sqlite3.Error as e:
+                print(f"Error en caché de favoritos: {e}")
+
+    def _write(self, conn, user_id, ids, seen_version):
+        """
+        Guarda un conjunto leído de la base de datos solo si la fila sigue en la
+        versión vista antes de leerlo (o sigue sin existir)
+        """
+        now = time.time()
+        try:
+            if seen_version is None:
+                row = conn.execute('''
+                    INSERT INTO favorite_ids (user_id, ids, version, expires_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (user_id) DO NOTHING
+                    RETURNING version
+                ''', (user_id, json.dumps(sorted(ids)), _initial_version(), now + self.ttl)).fetchone()
+            else:
+                row = conn.execute('''
+                    UPDATE favorite_ids SET ids = ?, version = version + 1, expires_at = ?
+                    WHERE user_id = ? AND version = ?
+                    RETURNING version
+                ''', (json.dumps(sorted(ids)), now + self.ttl, user_id, seen_version)).fetchone()
+            self._maybe_purge(conn)
+        except sqlite3.Error as e:
+            print(f"Error en caché de favoritos: {e}")
+            return
+        with self._lock:
+            if row is None:
+                self._stats['conflicts'] += 1
+            else:
+                self._store_local(user_id, row[0], ids)
+
+    def _upsert(self, conn, user_id, ids):
+        """Guarda el conjunto con una versión nueva y retorna esa versión"""
+        version = conn.execute('''
+            INSERT INTO favorite_ids (user_id, ids, version, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+                ids = excluded.ids,
+                version = favorite_ids.version + 1,
+                expires_at = excluded.expires_at
+            RETURNING version
+        ''', (user_id, json.dumps(sorted(ids)), _initial_version(), time.time() + self.ttl)).fetchone()[0]
+        self._maybe_purge(conn)
+        return version
+
+    def _tombstone(self, conn, user_id):
+        """Marca la copia como no vigente con una versión nueva, en lugar de borrarla"""
+        conn.execute('''
+            INSERT INTO favorite_ids (user_id, ids, version, expires_at) VALUES (?, '[]', ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+                ids = '[]',
+                version = favorite_ids.version + 1,
+                expires_at = excluded.expires_at
+        ''', (user_id, _initial_version(), time.time()))
+
+    def _maybe_purge(self, conn):
+        self._writes += 1
+        # Purga periódica: expirados (con margen, para no borrar una lápida que
+        # una carga en curso todavía debe encontrar) y, si sobran filas, las que vencen antes
+        if self._writes % 100 == 0:
+            conn.execute('DELETE FROM favorite_ids WHERE expires_at <= ?', (time.time() - TOMBSTONE_GRACE,))
+            conn.execute('''
+                DELETE FROM favorite_ids WHERE user_id NOT IN (
+                    SELECT user_id FROM favorite_ids ORDER BY expires_at DESC LIMIT ?
+                )
+            ''', (self.shared_max_entries,))
+
+    def _store_local(self, user_id, version, ids):
+        """Inserta en el LRU; el llamador debe tener el lock"""
+        self._entries[user_id] = (version, ids)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def stats(self):
+        """Contadores de aciertos, fallos y desalojos"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        return stats
+
+
+favorite_ids_cache = FavoriteIdsCache()
+
+
+def get_favorite_ids(user_id):
+    """IDs de los videos favoritos del usuario, desde el caché si es posible"""
+    from app.models.user import Favorite
+    return favorite_ids_cache.get(user_id, lambda: Favorite.ids_for(user_id))
+
+
+# ==========================
+# Exportación / importación NDJSON
+# ==========================
+NDJSON_CHUNK_SIZE = 500
+NDJSON_MAX_LINE = 64 * 1024
+VIDEO_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,20}$')
+
+
+def export_favorites(user_id, chunk_size=NDJSON_CHUNK_SIZE):
+    """
+    Generador de líneas NDJSON con los favoritos del usuario (más antiguos primero)
+    Lee por bloques con paginación por clave: nunca hay más de un bloque en memoria
+    """
+    from app.models.user import Favorite
+    for row in Favorite.iter_rows(user_id, chunk_size):
+        yield json.dumps({
+            'video_id': row.video_id,
+            'title': row.title or '',
+            'channel': row.channel or '',
+            'description': row.description or '',
+            'thumbnail': row.thumbnail or '',
+            'added_at': row.created_at.isoformat() + 'Z' if row.created_at else None
+        }, ensure_ascii=False) + '\n'
+
+
+def import_favorites(user_id, stream, chunk_size=NDJSON_CHUNK_SIZE):
+    """
+    Importa favoritos desde un flujo NDJSON (bytes) por bloques
+    Cada bloque se inserta con una sola sentencia INSERT OR IGNORE ejecutada
+    con executemany; los videos que ya estaban en favoritos se omiten
+    Retorna contadores: leídos, importados, duplicados e inválidos
+    """
+    from app.models.user import Favorite
+    result = {'read': 0, 'imported': 0, 'duplicates': 0, 'invalid': 0}
+    chunk = []
+
+    def flush():
+        inserted = Favorite.insert_ignore(chunk)
+        result['imported'] += inserted
+        result['duplicates'] += len(chunk) - inserted
+        video_index.add_favorites(user_id, [
+            {'id': row['video_id'], 'title': row['title'], 'channel': row['channel'],
+             'description': row['description'], 'thumbnail': row['thumbnail']}
+            for row in chunk
+        ])
+        chunk.clear()
+
+    while True:
+        line = stream.readline(NDJSON_MAX_LINE)
+        if not line:
+            break
+        if not line.strip():
+            continue
+        result['read'] += 1
+        row = _parse_favorite_line(user_id, line)
+        if row is None:
+            result['invalid'] += 1
+            # Resto de una línea más larga que el máximo: se descarta hasta el salto de línea
+            while not line.endswith(b'\n'):
+                line = stream.readline(NDJSON_MAX_LINE)
+                if not line:
+                    break
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    # Un solo descarte al final en lugar de reescribir el conjunto en cada bloque
+    if result['imported']:
+        favorite_ids_cache.invalidate(user_id)
+    return result
+
+
+def _parse_favorite_line(user_id, line):
+    """Fila lista para insertar a partir de una línea NDJSON, o None si no es válida"""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    video_id = data.get('video_id') or data.get('id')
+    if not isinstance(video_id, str) or not VIDEO_ID_RE.match(video_id):
+        return None
+
+    created_at = datetime.utcnow()
+    added_at = data.get('added_at')
+    if isinstance(added_at, str):
+        try:
+            created_at = datetime.fromisoformat(added_at.rstrip('Z'))
+        except ValueError:
+            pass
+
+    return {
+        'user_id': user_id,
+        'video_id': video_id,
+        'title': str(data.get('title') or '')[:200],
+        'channel': str(data.get('channel') or '')[:200],
+        'description': str(data.get('description') or ''),
+        'thumbnail': str(data.get('thumbnail') or '')[:500],
+        'created_at': created_at
+    }
@@ -0,0 +1,100 @@
+# ==================================================
+# ARCHIVO: app/services/identity_cache.py
+# ==================================================
+
+"""
+Caché de identidad para el user_loader de Flask-Login
+Guarda una versión ligera del usuario (id, usuario y email) en el caché de
+dos niveles, de modo que las peticiones autenticadas no consultan la tabla
+de usuarios. Se invalida al confirmar cambios o borrados del usuario y al
+cerrar sesión
+"""
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.services.cache_service import ResponseCache
+
+PENDING_KEY = 'identity_cache_invalidate'
+
+
+class SessionUser(UserMixin):
+    """Usuario de la sesión sin acceso a la base de datos"""
+
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+
+    def __repr__(self):
+        return f'<SessionUser {self.id}>'
+
+
+class IdentityCache:
+    """
+    LRU por worker con vida corta delante del nivel compartido SQLite
+    Una invalidación borra la entrada compartida al instante; las copias en
+    memoria de otros workers caducan como mucho en local_ttl segundos
+    """
+
+    def __init__(self):
+        self.cache = ResponseCache('identity', max_entries=2048, ttl=300, local_ttl=5)
+        self._listening = False
+
+    def init_app(self, app):
+        """Configura el caché y registra la invalidación por eventos de SQLAlchemy"""
+        from app.models.user import User
+
+        self.cache.init_app(app)
+        self.cache.ttl = app.config.get('IDENTITY_CACHE_TTL', self.cache.ttl)
+        self.cache.local_ttl = app.config.get('IDENTITY_CACHE_LOCAL_TTL', self.cache.local_ttl)
+        self.cache.max_entries = app.config.get('IDENTITY_CACHE_MAX_ENTRIES', self.cache.max_entries)
+        self.cache.stale_ttl = 0
+
+        # Los eventos se registran una sola vez por proceso aunque se creen varias apps
+        if not self._listening:
+            event.listen(User, 'after_update', self._on_change)
+            event.listen(User, 'after_delete', self._on_change)
+            event.listen(Session, 'after_commit', self._on_commit)
+            self._listening = True
+
+    # ==========================
+    # Lectura
+    # ==========================
+    def load(self, user_id):
+        """SessionUser del id indicado, o None si no existe"""
+        key = str(user_id)
+        data = self.cache.get(key)
+        if data is None:
+            from app.models.user import User
+            user = User.query.get(int(user_id))
+            if user is None:
+                return None
+            data = {'id': user.id, 'username': user.username, 'email': user.email}
+            self.cache.set(key, data)
+        return SessionUser(**data)
+
+    # ==========================
+    # Invalidación
+    # ==========================
+    def invalidate(self, user_id):
+        """Descarta la identidad cacheada del usuario"""
+        self.cache.delete(str(user_id))
+
+    def _on_change(self, mapper, connection, target):
+        # Se borra ya (para la propia petición) y otra vez tras el commit, por si
+        # otra petición volvió a cargar la fila vieja antes de confirmarse el cambio
+        self.invalidate(target.id)
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault(PENDING_KEY, set()).add(target.id)
+
+    def _on_commit(self, session):
+        for user_id in session.info.pop(PENDING_KEY, ()):
+            self.invalidate(user_id)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+identity_cache = IdentityCache()
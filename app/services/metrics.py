@@ -0,0 +1,479 @@
+# ==================================================
+# ARCHIVO: app/services/metrics.py
+# ==================================================
+
+"""
+Instrumentación de peticiones, SQL y llamadas a la API de YouTube
+Cada worker acumula sus contadores e histogramas en memoria (un lock y unas
+pocas sumas por petición) y cada pocos segundos publica en el almacén SQLite
+compartido lo que sumaron desde la publicación anterior: los contadores
+globales solo crecen, aunque los workers se reciclen (max_requests de
+gunicorn). /metrics los expone en formato de texto de Prometheus
+
+Los gauges (tamaños, estado del circuito) no se acumulan: cada worker guarda
+su último valor y solo se suman los de copias de los últimos
+GAUGE_MAX_AGE_INTERVALS intervalos de publicación, así que un worker que
+terminó deja de contar enseguida
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+
+from app.services.cache_service import SharedConnection, shared_db_path
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HISTOGRAMS = {
+    'tut0hub_request_duration_seconds': REQUEST_BUCKETS,
+    'tut0hub_upstream_request_duration_seconds': UPSTREAM_BUCKETS,
+}
+
+# Nombre: (tipo, descripción)
+METRICS = {
+    'tut0hub_request_duration_seconds': ('histogram', 'Duración de las peticiones HTTP por endpoint'),
+    'tut0hub_requests_total': ('counter', 'Peticiones HTTP por endpoint, método y estado'),
+    'tut0hub_sql_queries_total': ('counter', 'Consultas SQL por endpoint (none = fuera de una petición)'),
+    'tut0hub_sql_seconds_total': ('counter', 'Tiempo en consultas SQL por endpoint'),
+    'tut0hub_upstream_request_duration_seconds': ('histogram', 'Duración de las llamadas a la API de YouTube por endpoint y estado'),
+    'tut0hub_upstream_retries_total': ('counter', 'Reintentos de llamadas a la API de YouTube'),
+    'tut0hub_upstream_bytes_received_total': ('counter', 'Bytes recibidos de la API de YouTube'),
+    'tut0hub_upstream_conditional_requests_total': ('counter', 'Llamadas condicionales (If-None-Match)'),
+    'tut0hub_upstream_not_modified_total': ('counter', 'Respuestas 304 de la API de YouTube'),
+    'tut0hub_upstream_bytes_saved_total': ('counter', 'Bytes estimados ahorrados por respuestas 304'),
+    'tut0hub_upstream_breaker_open': ('gauge', 'Workers con el circuito de YouTube abierto'),
+    'tut0hub_upstream_breaker_opened_total': ('counter', 'Aperturas del circuito de YouTube'),
+    'tut0hub_upstream_coalesced_total': ('counter', 'Llamadas a YouTube evitadas por coalescencia'),
+    'tut0hub_cache_requests_total': ('counter', 'Lecturas de caché por resultado'),
+    'tut0hub_cache_evictions_total': ('counter', 'Entradas desalojadas del LRU en memoria'),
+    'tut0hub_cache_entries': ('gauge', 'Entradas en los LRU en memoria (suma de workers)'),
+    'tut0hub_cache_hit_ratio': ('gauge', 'Fracción de lecturas de caché resueltas sin cargar el valor'),
+    'tut0hub_cache_revalidations_total': ('counter', 'Revalidaciones en segundo plano por resultado'),
+    'tut0hub_password_hash_operations_total': ('counter', 'Operaciones bcrypt por tipo'),
+    'tut0hub_password_hash_rejected_total': ('counter', 'Operaciones bcrypt rechazadas por pool saturado'),
+    'tut0hub_password_hash_wait_seconds_total': ('counter', 'Tiempo de espera en la cola de bcrypt'),
+    'tut0hub_password_hash_work_seconds_total': ('counter', 'Tiempo de CPU en bcrypt'),
+    'tut0hub_password_hash_queue_depth': ('gauge', 'Operaciones bcrypt esperando en cola (suma de workers)'),
+    'tut0hub_password_hash_running': ('gauge', 'Operaciones bcrypt en ejecución (suma de workers)'),
+    'tut0hub_password_hash_queue_max_depth': ('gauge', 'Mayor profundidad de cola vista en un worker'),
+    'tut0hub_password_hash_queue_limit': ('gauge', 'Profundidad de cola por worker a partir de la cual se responde 503'),
+    'tut0hub_quota_units': ('gauge', 'Cuota diaria de la API de YouTube'),
+    'tut0hub_metrics_workers': ('gauge', 'Workers con copia reciente (cuyos gauges se suman)'),
+}
+
+# Una copia de gauges con más de estos intervalos de publicación no se suma
+GAUGE_MAX_AGE_INTERVALS = 3
+
+# Gauges por worker que se combinan con el máximo en lugar de sumarse
+MAX_GAUGES = {'tut0hub_password_hash_queue_max_depth', 'tut0hub_password_hash_queue_limit'}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _is_gauge(name):
+    return METRICS.get(name, ('',))[0] == 'gauge'
+
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metrics:
+    """
+    Registro de series del worker: {(nombre, ((etiqueta, valor), ...)): valor}
+    Los histogramas guardan cada observación en su bucket (no acumulado); el
+    acumulado por le se calcula al exponerlos
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.flush_interval = 5
+        self.retention = 3600
+
+        self._series = {}
+        self._published = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._flushed_at = 0.0
+        self._shared = SharedConnection()
+        self._instrumented = set()
+
+    def init_app(self, app):
+        """Registra los hooks de petición y las tablas compartidas"""
+        self.enabled = app.config.get('METRICS_ENABLED', self.enabled)
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', self.flush_interval)
+        self.retention = app.config.get('METRICS_RETENTION', self.retention)
+        if not self.enabled:
+            return
+
+        self._shared.db_path = shared_db_path(app)
+        conn = self._shared.get()
+        if conn is not None:
+            # Formato anterior: copias completas por pid, que seguían sumando tras reciclar el worker
+            conn.execute('DROP TABLE IF EXISTS metrics_snapshots')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS metrics_totals (
+                    name TEXT NOT NULL,
+                    labels TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (name, labels)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS metrics_gauges (
+                    pid INTEGER NOT NULL PRIMARY KEY,
+                    series TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def instrument_engine(self, engine):
+        """Cuenta y cronometra las consultas del engine (una vez por engine)"""
+        if not self.enabled or id(engine) in self._instrumented:
+            return
+        self._instrumented.add(id(engine))
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    # ==========================
+    # Registro
+    # ==========================
+    def inc(self, name, labels=(), amount=1):
+        with self._lock:
+            key = (name, labels)
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        """Registra una observación en un histograma de HISTOGRAMS"""
+        le = next((bound for bound in HISTOGRAMS[name] if value <= bound), '+Inf')
+        bucket = (name + '_bucket', labels + (('le', le),))
+        total = (name + '_sum', labels)
+        count = (name + '_count', labels)
+        with self._lock:
+            series = self._series
+            series[bucket] = series.get(bucket, 0) + 1
+            series[total] = series.get(total, 0) + value
+            series[count] = series.get(count, 0) + 1
+
+    def observe_upstream(self, endpoint, status, elapsed):
+        """Una llamada a la API de YouTube (status = código HTTP o 'error')"""
+        if self.enabled:
+            self.observe('tut0hub_upstream_request_duration_seconds', elapsed,
+                         (('endpoint', endpoint), ('status', str(status))))
+
+    # ==========================
+    # Hooks de petición y SQL
+    # ==========================
+    def _start_request(self):
+        # Diccionario propio de la petición: el cierre de la respuesta lo usa
+        # aunque g ya no exista
+        g.metrics_request = {'started': time.perf_counter(), 'sql_queries': 0, 'sql_seconds': 0.0}
+
+    def _finish_request(self, response):
+        state = g.get('metrics_request')
+        if state is None:
+            return response
+
+        labels = (('endpoint', request.endpoint or 'unmatched'),)
+        status_labels = labels + (('method', request.method), ('status', str(response.status_code)))
+        if response.is_streamed:
+            # El cuerpo (y las llamadas lentas que hace) se genera después de
+            # after_request: se mide hasta el cierre y sin Server-Timing
+            response.call_on_close(lambda: self._record_request(state, labels, status_labels))
+            return response
+
+        elapsed = self._record_request(state, labels, status_labels)
+        response.headers['Server-Timing'] = (f'app;dur={elapsed * 1000:.1f}, '
+                                             f'db;dur={state["sql_seconds"] * 1000:.1f};'
+                                             f'desc="{state["sql_queries"]} consultas"')
+        return response
+
+    def _record_request(self, state, labels, status_labels):
+        """Registra duración, estado y SQL de una petición terminada; retorna la duración"""
+        elapsed = time.perf_counter() - state['started']
+        self.observe('tut0hub_request_duration_seconds', elapsed, labels)
+        with self._lock:
+            series = self._series
+            for key, amount in (
+                (('tut0hub_requests_total', status_labels), 1),
+                (('tut0hub_sql_queries_total', labels), state['sql_queries']),
+                (('tut0hub_sql_seconds_total', labels), state['sql_seconds']),
+            ):
+                series[key] = series.get(key, 0) + amount
+        self._maybe_flush()
+        return elapsed
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        state = g.get('metrics_request') if has_request_context() else None
+        if state is not None:
+            state['sql_queries'] += 1
+            state['sql_seconds'] += elapsed
+        else:
+            self.inc('tut0hub_sql_queries_total', (('endpoint', 'none'),))
+            self.inc('tut0hub_sql_seconds_total', (('endpoint', 'none'),), elapsed)
+
+    # ==========================
+    # Almacén compartido
+    # ==========================
+    def _maybe_flush(self):
+        now = time.time()
+        if now - self._flushed_at >= self.flush_interval:
+            self._flushed_at = now
+            self.flush()
+
+    def snapshot(self):
+        """Series del worker más los contadores de servicios"""
+        with self._lock:
+            forked = self._pid != os.getpid()
+            if forked:
+                # Lo acumulado por el proceso padre antes del fork no es de este worker
+                self._series = {}
+                self._pid = os.getpid()
+            series = dict(self._series)
+        services = dict(_service_series())
+        if forked:
+            # Los contadores de servicios heredados tampoco: se toman como ya publicados
+            self._published = services
+        for key, value in services.items():
+            series[key] = series.get(key, 0) + value
+        return series
+
+    def flush(self):
+        """
+        Suma a los totales compartidos lo contado desde la última publicación
+        y reemplaza la copia de gauges del worker
+        """
+        conn = self._shared.get()
+        if conn is None:
+            return
+        with self._flush_lock:
+            series = self.snapshot()
+            counters = {key: value for key, value in series.items() if not _is_gauge(key[0])}
+            gauges = [[name, labels, value] for (name, labels), value in series.items() if _is_gauge(name)]
+            deltas = []
+            for (name, labels), value in counters.items():
+                previous = self._published.get((name, labels), 0)
+                # Un contador que baja se reinició en el servicio: cuenta desde cero
+                delta = value - previous if value >= previous else value
+                if delta:
+                    deltas.append((name, json.dumps(labels), delta))
+
+            now = time.time()
+            try:
+                with conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.executemany('''
+                        INSERT INTO metrics_totals (name, labels, value) VALUES (?, ?, ?)
+                        ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value
+                    ''', deltas)
+                    conn.execute('INSERT OR REPLACE INTO metrics_gauges (pid, series, updated_at) VALUES (?, ?, ?)',
+                                 (os.getpid(), json.dumps(gauges), now))
+                    conn.execute('DELETE FROM metrics_gauges WHERE updated_at <= ?', (now - self.retention,))
+            except sqlite3.Error as e:
+                print(f"Error publicando métricas: {e}")
+                return
+            self._published = counters
+
+    def retire(self):
+        """Publica lo pendiente y quita la copia de gauges (el worker va a terminar)"""
+        conn = self._shared.get()
+        if not self.enabled or conn is None:
+            return
+        self.flush()
+        try:
+            conn.execute('DELETE FROM metrics_gauges WHERE pid = ?', (os.getpid(),))
+        except sqlite3.Error as e:
+            print(f"Error retirando métricas del worker: {e}")
+
+    def collect(self):
+        """Totales de todos los workers y número de workers con copia reciente"""
+        self.flush()
+        conn = self._shared.get()
+        if conn is None:
+            return self.snapshot(), 1
+
+        totals = {}
+        try:
+            counters = conn.execute('SELECT name, labels, value FROM metrics_totals').fetchall()
+            gauges = conn.execute('SELECT series FROM metrics_gauges WHERE updated_at > ?',
+                                  (time.time() - self.flush_interval * GAUGE_MAX_AGE_INTERVALS,)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error leyendo métricas: {e}")
+            return self.snapshot(), 1
+        for name, labels, value in counters:
+            totals[(name, tuple(tuple(label) for label in json.loads(labels)))] = value
+        # Los contadores que aún no se incrementaron en ningún worker se exponen a 0
+        for key in self._published:
+            totals.setdefault(key, 0)
+        for (data,) in gauges:
+            for name, labels, value in json.loads(data):
+                key = (name, tuple(tuple(label) for label in labels))
+                if name in MAX_GAUGES:
+                    totals[key] = max(totals.get(key, 0), value)
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals, len(gauges)
+
+    # ==========================
+    # Formato de Prometheus
+    # ==========================
+    def render(self):
+        """Texto de exposición de Prometheus (versión 0.0.4)"""
+        series, workers = self.collect()
+        series.update(_cache_ratios(series))
+        for key, value in _local_gauges():
+            series[key] = value
+        series[('tut0hub_metrics_workers', ())] = workers
+
+        by_metric = {}
+        for (name, labels), value in series.items():
+            base = name
+            for suffix in ('_bucket', '_sum', '_count'):
+                if name.endswith(suffix) and name[:-len(suffix)] in HISTOGRAMS:
+                    base = name[:-len(suffix)]
+            by_metric.setdefault(base, []).append((name, labels, value))
+
+        lines = []
+        for base in sorted(by_metric):
+            kind, description = METRICS.get(base, ('untyped', base))
+            lines.append(f'# HELP {base} {description}')
+            lines.append(f'# TYPE {base} {kind}')
+            if base in HISTOGRAMS:
+                lines.extend(_render_histogram(base, by_metric[base]))
+            else:
+                for name, labels, value in sorted(by_metric[base]):
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _render_histogram(base, samples):
+    """Buckets acumulados por conjunto de etiquetas, con +Inf, _sum y _count"""
+    buckets = {}
+    sums = {}
+    for name, labels, value in samples:
+        if name.endswith('_bucket'):
+            le = dict(labels)['le']
+            rest = tuple(label for label in labels if label[0] != 'le')
+            buckets.setdefault(rest, {})[le] = value
+        elif name.endswith('_sum'):
+            sums.setdefault(labels, {})['sum'] = value
+        else:
+            sums.setdefault(labels, {})['count'] = value
+
+    lines = []
+    for labels in sorted(set(buckets) | set(sums)):
+        observed = buckets.get(labels, {})
+        cumulative = 0
+        for bound in HISTOGRAMS[base] + ('+Inf',):
+            cumulative += observed.get(bound, 0)
+            le = bound if bound == '+Inf' else _format_value(bound)
+            lines.append(f'{base}_bucket{_format_labels(labels + (("le", le),))} {_format_value(cumulative)}')
+        totals = sums.get(labels, {})
+        lines.append(f'{base}_sum{_format_labels(labels)} {_format_value(totals.get("sum", 0))}')
+        lines.append(f'{base}_count{_format_labels(labels)} {_format_value(totals.get("count", cumulative))}')
+    return lines
+
+
+def _service_series():
+    """Contadores propios de los servicios, convertidos a series sumables entre workers"""
+    from app.services.cache_service import search_cache, video_cache, stats_cache
+    from app.services.trending_service import trending_cache
+    from app.services.identity_cache import identity_cache
+    from app.services.favorites_service import favorite_ids_cache
+    from app.services.password_hasher import password_hasher
+    from app.services.youtube_client import youtube_client
+    from app.services.youtube_service import upstream_flight, revalidation_stats
+
+    for endpoint, values in youtube_client.stats().items():
+        labels = (('endpoint', endpoint),)
+        yield ('tut0hub_upstream_retries_total', labels), values['retries']
+        yield ('tut0hub_upstream_bytes_received_total', labels), values['bytes_received']
+        yield ('tut0hub_upstream_conditional_requests_total', labels), values['conditional_requests']
+        yield ('tut0hub_upstream_not_modified_total', labels), values['not_modified']
+        yield ('tut0hub_upstream_bytes_saved_total', labels), values['bytes_saved']
+
+    breaker = youtube_client.breaker.stats()
+    yield ('tut0hub_upstream_breaker_open', ()), 1 if breaker['state'] == 'open' else 0
+    yield ('tut0hub_upstream_breaker_opened_total', ()), breaker['opened']
+    yield ('tut0hub_upstream_coalesced_total', ()), upstream_flight.stats()['coalesced']
+
+    caches = [(cache.namespace, cache.stats()) for cache in (search_cache, video_cache, stats_cache, trending_cache)]
+    caches.append(('identity', identity_cache.stats()))
+    caches.append(('favorite_ids', favorite_ids_cache.stats()))
+    for namespace, values in caches:
+        for result in ('hits', 'shared_hits', 'stale_hits', 'misses'):
+            if result in values:
+                yield ('tut0hub_cache_requests_total', (('cache', namespace), ('result', result))), values[result]
+        yield ('tut0hub_cache_evictions_total', (('cache', namespace),)), values['evictions']
+        yield ('tut0hub_cache_entries', (('cache', namespace),)), values['size']
+
+    for result, value in revalidation_stats.items():
+        yield ('tut0hub_cache_revalidations_total', (('result', result),)), value
+
+    hasher = password_hasher.stats()
+    yield ('tut0hub_password_hash_operations_total', (('op', 'hash'),)), hasher['hashes']
+    yield ('tut0hub_password_hash_operations_total', (('op', 'verify'),)), hasher['verifications']
+    yield ('tut0hub_password_hash_rejected_total', ()), hasher['rejected']
+    yield ('tut0hub_password_hash_wait_seconds_total', ()), hasher['wait_seconds']
+    yield ('tut0hub_password_hash_work_seconds_total', ()), hasher['work_seconds']
+    yield ('tut0hub_password_hash_queue_depth', ()), hasher['queued']
+    yield ('tut0hub_password_hash_running', ()), hasher['running']
+    yield ('tut0hub_password_hash_queue_max_depth', ()), hasher['max_queue_depth']
+    yield ('tut0hub_password_hash_queue_limit', ()), hasher['max_queue']
+
+
+def _cache_ratios(series):
+    """Tasa de aciertos por caché a partir de los contadores ya sumados"""
+    counts = {}
+    for (name, labels), value in series.items():
+        if name == 'tut0hub_cache_requests_total':
+            values = dict(labels)
+            totals = counts.setdefault(values['cache'], [0, 0])
+            totals[1] += value
+            if values['result'] in ('hits', 'shared_hits'):
+                totals[0] += value
+    return {
+        ('tut0hub_cache_hit_ratio', (('cache', cache),)): hits / total if total else 0.0
+        for cache, (hits, total) in counts.items()
+    }
+
+
+def _local_gauges():
+    """Valores que ya son globales (almacén compartido) y no deben sumarse"""
+    from app.services.quota_scheduler import quota_scheduler
+
+    quota = quota_scheduler.status()
+    yield ('tut0hub_quota_units', (('kind', 'budget'),)), quota['budget']
+    yield ('tut0hub_quota_units', (('kind', 'spent'),)), quota['spent']
+    yield ('tut0hub_quota_units', (('kind', 'remaining'),)), quota['remaining']
+
+
+metrics = Metrics()
@@ -0,0 +1,175 @@
+# ==================================================
+# ARCHIVO: app/services/password_hasher.py
+# ==================================================
+
+"""
+Hash y verificación de contraseñas con bcrypt en un pool de hilos acotado
+El coste se calibra al arrancar para acercarse a una latencia objetivo; los
+hashes con otro coste se rehacen al iniciar sesión. Con el pool lleno las
+peticiones esperan un tiempo máximo y después se rechazan en lugar de
+acumular trabajo de CPU
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+MIN_ROUNDS = 10
+MAX_ROUNDS = 15
+
+
+class PasswordHasherBusy(Exception):
+    """El pool de hash está saturado y la petición no obtuvo turno a tiempo"""
+
+
+class PasswordHasher:
+    """
+    hash() / verify() se ejecutan en el pool y bloquean al llamador hasta terminar
+    El número de trabajos admitidos (en curso + en cola) está limitado por un semáforo
+    """
+
+    def __init__(self):
+        self.rounds = 12
+        self.target_ms = 250
+        self.max_workers = 2
+        self.max_queue = 16
+        self.queue_timeout = 5.0
+
+        self._pool = None
+        self._pool_pid = None
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._dummy_hash = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._stats = {
+            'hashes': 0,
+            'verifications': 0,
+            'rejected': 0,
+            'max_queue_depth': 0,
+            'wait_seconds': 0.0,
+            'work_seconds': 0.0,
+        }
+
+    def init_app(self, app):
+        """Configura el pool y fija el coste (calibrado o el configurado)"""
+        self.target_ms = app.config.get('BCRYPT_TARGET_MS', self.target_ms)
+        self.max_workers = app.config.get('PASSWORD_HASH_WORKERS', self.max_workers)
+        self.max_queue = app.config.get('PASSWORD_HASH_QUEUE', self.max_queue)
+        self.queue_timeout = app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', self.queue_timeout)
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+
+        rounds = app.config.get('BCRYPT_ROUNDS')
+        self.rounds = rounds if rounds else self.calibrate(self.target_ms)
+        # Hash de referencia para igualar el tiempo de respuesta con usuarios inexistentes
+        self._dummy_hash = bcrypt.hashpw(os.urandom(16).hex().encode('utf-8'), bcrypt.gensalt(self.rounds))
+
+    @staticmethod
+    def calibrate(target_ms):
+        """
+        Menor coste cuyo hash tarda al menos target_ms en esta máquina
+        Cada punto de coste duplica el tiempo, así que basta medir una vez y extrapolar
+        """
+        password = b'calibracion'
+        started = time.perf_counter()
+        bcrypt.hashpw(password, bcrypt.gensalt(MIN_ROUNDS))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        rounds = MIN_ROUNDS
+        while rounds < MAX_ROUNDS and elapsed_ms < target_ms:
+            rounds += 1
+            elapsed_ms *= 2
+        return rounds
+
+    # ==========================
+    # API pública
+    # ==========================
+    def hash(self, password):
+        """Hash bcrypt de la contraseña con el coste actual"""
+        hashed = self._run('hashes', bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(self.rounds))
+        return hashed.decode('utf-8')
+
+    def verify(self, password, hashed):
+        """True si la contraseña corresponde al hash"""
+        try:
+            return self._run('verifications', bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+        except ValueError:
+            # Hash corrupto o con formato desconocido
+            return False
+
+    def dummy_verify(self, password):
+        """Verificación contra un hash ficticio: mismo coste que un usuario real"""
+        if self._dummy_hash is None:
+            self._dummy_hash = bcrypt.hashpw(b'dummy', bcrypt.gensalt(self.rounds))
+        self._run('verifications', bcrypt.checkpw, password.encode('utf-8'), self._dummy_hash)
+        return False
+
+    def needs_rehash(self, hashed):
+        """
+        True si el hash se generó con un coste menor que el actual
+        Nunca se baja el coste: el calibrado puede variar entre reinicios o máquinas
+        """
+        try:
+            return int(hashed.split('$')[2]) < self.rounds
+        except (IndexError, ValueError, AttributeError):
+            return True
+
+    # ==========================
+    # Pool
+    # ==========================
+    def _executor(self):
+        # El pool no sobrevive a un fork: se crea uno por proceso
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bcrypt')
+                self._pool_pid = os.getpid()
+                self._queued = 0
+                self._running = 0
+            return self._pool
+
+    def _run(self, counter, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise PasswordHasherBusy('Demasiadas verificaciones de contraseña en curso')
+
+        executor = self._executor()
+        submitted = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._queued)
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._stats['wait_seconds'] += started - submitted
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._stats[counter] += 1
+                    self._stats['work_seconds'] += time.perf_counter() - started
+
+        try:
+            return executor.submit(task).result()
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        """Coste actual, profundidad de cola y tiempos acumulados de espera y trabajo"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['queued'] = self._queued
+            stats['running'] = self._running
+        stats['rounds'] = self.rounds
+        stats['max_workers'] = self.max_workers
+        stats['max_queue'] = self.max_queue
+        return stats
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,171 @@
+# ==================================================
+# ARCHIVO: app/services/profiler.py
+# ==================================================
+
+"""
+Perfilado bajo demanda de peticiones con cProfile
+Una petición se perfila si trae la cabecera X-Profile con PROFILER_TOKEN o
+si la elige el muestreo (PROFILER_SAMPLE_RATE). El resultado se guarda en
+instance/profiles/ con el endpoint y la duración en el nombre, conservando
+solo los PROFILER_MAX_FILES más recientes. En las páginas en streaming el
+perfil cubre también la generación del cuerpo, hasta que se cierra la respuesta
+
+Sin token ni muestreo no se registra ningún hook: desactivado no cuesta nada
+"""
+import hmac
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import cProfile
+
+from flask import g, request
+
+PROFILE_HEADER = 'X-Profile'
+
+# <milisegundos desde epoch>-<pid>-<endpoint>-<duración ms>.prof
+_FILENAME_RE = re.compile(r'^(\d+)-(\d+)-([A-Za-z0-9_.]+)-(\d+)\.prof$')
+_UNSAFE_RE = re.compile(r'[^A-Za-z0-9_.]')
+
+
+class RequestProfiler:
+    """
+    Un perfil a la vez por worker: cProfile no admite perfiles simultáneos en
+    todas las versiones de Python, así que si ya hay uno en curso la petición
+    sigue sin perfilar
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.token = ''
+        self.sample_rate = 0.0
+        self.max_files = 200
+        self.directory = None
+        self._busy = threading.Lock()
+
+    def init_app(self, app):
+        """Registra los hooks solo si hay token o muestreo configurados"""
+        self.token = app.config.get('PROFILER_TOKEN', self.token)
+        self.sample_rate = app.config.get('PROFILER_SAMPLE_RATE', self.sample_rate)
+        self.max_files = app.config.get('PROFILER_MAX_FILES', self.max_files)
+        self.directory = os.path.join(app.instance_path, 'profiles')
+        self.enabled = bool(self.token) or self.sample_rate > 0
+        if not self.enabled:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._abandon)
+
+    # ==========================
+    # Hooks
+    # ==========================
+    def _triggered(self):
+        header = request.headers.get(PROFILE_HEADER)
+        if header is not None:
+            return bool(self.token) and hmac.compare_digest(header.encode('utf-8'), self.token.encode('utf-8'))
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _start(self):
+        if not self._triggered() or not self._busy.acquire(blocking=False):
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Otra herramienta de perfilado está activa en el proceso
+            self._busy.release()
+            return
+        g.profiler = (profile, time.perf_counter())
+
+    def _finish(self, response):
+        state = g.pop('profiler', None)
+        if state is None:
+            return response
+
+        endpoint = request.endpoint or 'unmatched'
+        if response.is_streamed:
+            # El cuerpo se genera después de after_request: el perfil sigue
+            # hasta el cierre y el ID solo aparece en /admin/profiles
+            response.call_on_close(lambda: self._stop(state, endpoint))
+            return response
+
+        name = self._stop(state, endpoint)
+        if name:
+            response.headers['X-Profile-Id'] = name
+        return response
+
+    def _stop(self, state, endpoint):
+        """Detiene el perfil, libera el worker y lo guarda; retorna el nombre del archivo"""
+        profile, started = state
+        profile.disable()
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        self._busy.release()
+        return self._save(profile, endpoint, elapsed_ms)
+
+    def _abandon(self, exc):
+        # La petición terminó sin pasar por after_request (excepción no manejada)
+        state = g.pop('profiler', None)
+        if state is not None:
+            state[0].disable()
+            self._busy.release()
+
+    # ==========================
+    # Archivos
+    # ==========================
+    def _save(self, profile, endpoint, elapsed_ms):
+        name = f'{int(time.time() * 1000)}-{os.getpid()}-{_UNSAFE_RE.sub("_", endpoint)}-{elapsed_ms}.prof'
+        try:
+            profile.dump_stats(os.path.join(self.directory, name))
+            self._rotate()
+        except OSError as e:
+            print(f"Error guardando perfil: {e}")
+            return None
+        return name
+
+    def _rotate(self):
+        """Borra los perfiles más antiguos por encima de max_files"""
+        names = sorted(name for name in os.listdir(self.directory) if _FILENAME_RE.match(name))
+        for name in names[:max(0, len(names) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def list_profiles(self, limit=50):
+        """Perfiles guardados, del más lento al más rápido"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            match = _FILENAME_RE.match(name)
+            if match:
+                captured_ms, pid, endpoint, elapsed_ms = match.groups()
+                profiles.append({
+                    'id': name,
+                    'endpoint': endpoint,
+                    'duration_ms': int(elapsed_ms),
+                    'captured_at': int(captured_ms) / 1000,
+                    'pid': int(pid),
+                })
+        profiles.sort(key=lambda profile: profile['duration_ms'], reverse=True)
+        return profiles[:limit]
+
+    def report(self, name, sort='cumulative', lines=40):
+        """Resumen de pstats de un perfil guardado (None si no existe)"""
+        if not _FILENAME_RE.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            return None
+        output = io.StringIO()
+        stats = pstats.Stats(path, stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(lines)
+        return output.getvalue()
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,319 @@
+# ==================================================
+# ARCHIVO: app/services/quota_scheduler.py
+# ==================================================
+
+"""
+Planificador central de llamadas a la API de YouTube
+Lleva la cuenta de unidades de cuota por día y por endpoint, limita las
+peticiones por segundo con un token bucket y da prioridad a las búsquedas
+interactivas sobre el trabajo en segundo plano
+
+Cuota y bucket viven en el almacén SQLite compartido y se actualizan dentro
+de BEGIN IMMEDIATE, así que YOUTUBE_DAILY_QUOTA y YOUTUBE_MAX_QPS son límites
+globales aunque haya varios workers. Sin almacén, ambos pasan a ser por proceso
+"""
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from app.services.cache_service import SharedConnection, shared_db_path
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+except Exception:
+    # Sin base de datos de zonas horarias (ej. Windows sin tzdata) se usa UTC
+    QUOTA_TIMEZONE = timezone.utc
+
+# Coste en unidades de cada endpoint según la documentación de la API
+ENDPOINT_COSTS = {
+    'search': 100,
+    'videos': 1,
+}
+
+# Fila del token bucket compartido
+BUCKET_NAME = 'youtube'
+
+# Carriles de prioridad
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class QuotaExceededError(Exception):
+    """No queda cuota suficiente para la prioridad solicitada"""
+
+
+class RateLimitedError(Exception):
+    """No se obtuvo turno en el token bucket dentro del tiempo de espera"""
+
+
+class QuotaScheduler:
+    """
+    Toda llamada saliente pide turno con acquire() antes de ejecutarse
+    El trabajo en segundo plano se descarta cuando la cuota restante baja de la reserva
+    y cede el turno mientras haya peticiones interactivas esperando
+    """
+
+    def __init__(self):
+        self.daily_budget = 10000
+        self.background_reserve = 2000
+        self.max_qps = 5.0
+        self.burst = 10
+        self.max_wait = 2.0
+
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._interactive_waiting = 0
+        self._cond = threading.Condition()
+        self._shared = SharedConnection()
+        self._local_usage = {}
+        self._stats = {
+            'granted': 0,
+            'throttled': 0,
+            'shed': 0,
+            'rejected': 0,
+        }
+
+    def init_app(self, app):
+        """Configura presupuesto y límites a partir de la configuración de la app"""
+        self.daily_budget = app.config.get('YOUTUBE_DAILY_QUOTA', self.daily_budget)
+        self.background_reserve = app.config.get('YOUTUBE_BACKGROUND_RESERVE', self.background_reserve)
+        self.max_qps = app.config.get('YOUTUBE_MAX_QPS', self.max_qps)
+        self.burst = app.config.get('YOUTUBE_QPS_BURST', self.burst)
+        self.max_wait = app.config.get('YOUTUBE_SCHEDULER_MAX_WAIT', self.max_wait)
+        self._tokens = float(self.burst)
+
+        self._shared.db_path = shared_db_path(app)
+        conn = self._shared.get()
+        if conn is not None:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS quota_usage (
+                    day TEXT NOT NULL,
+                    endpoint TEXT NOT NULL,
+                    units INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, endpoint)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS quota_bucket (
+                    name TEXT NOT NULL PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+
+    # ==========================
+    # Turnos
+    # ==========================
+    def acquire(self, endpoint, priority=INTERACTIVE):
+        """
+        Reserva cuota y un token de QPS para una llamada al endpoint
+        Lanza QuotaExceededError o RateLimitedError si no se puede ejecutar
+        """
+        cost = ENDPOINT_COSTS.get(endpoint, 1)
+        floor = 0 if priority == INTERACTIVE else self.background_reserve
+        reserved, remaining = self._reserve(endpoint, cost, floor)
+
+        if not reserved and remaining < cost:
+            self._count('rejected')
+            raise QuotaExceededError(f'Cuota diaria agotada ({remaining} unidades restantes)')
+        if not reserved:
+            self._count('shed')
+            raise QuotaExceededError(f'Trabajo en segundo plano descartado: {remaining} unidades restantes')
+
+        try:
+            self._take_token(priority)
+        except RateLimitedError:
+            # La llamada no se hará: se devuelven las unidades reservadas
+            self._charge(endpoint, -cost)
+            raise
+
+    def _take_token(self, priority):
+        deadline = time.monotonic() + self.max_wait
+        if priority == INTERACTIVE:
+            with self._cond:
+                self._interactive_waiting += 1
+        try:
+            while True:
+                with self._cond:
+                    can_go = priority == INTERACTIVE or self._interactive_waiting == 0
+                wait = self._try_token() if can_go else 0.05
+                if wait == 0:
+                    self._count('granted')
+                    return
+
+                now = time.monotonic()
+                if now >= deadline:
+                    self._count('throttled')
+                    raise RateLimitedError('Límite de peticiones por segundo alcanzado')
+                with self._cond:
+                    self._cond.wait(min(max(wait, 0.001), deadline - now))
+        finally:
+            if priority == INTERACTIVE:
+                with self._cond:
+                    self._interactive_waiting -= 1
+                    self._cond.notify_all()
+
+    def _try_token(self):
+        """Toma un token del bucket compartido: 0 si lo obtuvo, o segundos hasta el siguiente"""
+        conn = self._shared.get()
+        if conn is None:
+            return self._try_local_token()
+
+        now = time.time()
+        try:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                tokens = self._shared_tokens(conn, now)
+                taken = tokens >= 1
+                if taken:
+                    tokens -= 1
+                conn.execute('INSERT OR REPLACE INTO quota_bucket (name, tokens, updated_at) VALUES (?, ?, ?)',
+                             (BUCKET_NAME, tokens, now))
+        except sqlite3.Error as e:
+            print(f"Error en el token bucket compartido: {e}")
+            return self._try_local_token()
+        return 0 if taken else (1 - tokens) / self.max_qps
+
+    def _shared_tokens(self, conn, now):
+        """Tokens disponibles en el bucket compartido, repuestos hasta now"""
+        row = conn.execute('SELECT tokens, updated_at FROM quota_bucket WHERE name = ?', (BUCKET_NAME,)).fetchone()
+        if row is None:
+            return float(self.burst)
+        return min(self.burst, row[0] + max(0.0, now - row[1]) * self.max_qps)
+
+    def _try_local_token(self):
+        """Bucket del proceso, cuando no hay almacén compartido"""
+        with self._cond:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.max_qps
+
+    def _refill(self):
+        """Repone tokens según el tiempo transcurrido; el llamador debe tener el lock"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.max_qps)
+        self._last_refill = now
+
+    def tokens(self):
+        """Tokens disponibles ahora (del bucket compartido si existe)"""
+        conn = self._shared.get()
+        if conn is not None:
+            try:
+                return self._shared_tokens(conn, time.time())
+            except sqlite3.Error as e:
+                print(f"Error leyendo el token bucket compartido: {e}")
+        with self._cond:
+            self._refill()
+            return self._tokens
+
+    # ==========================
+    # Contabilidad de cuota
+    # ==========================
+    @staticmethod
+    def quota_day():
+        """Día de cuota actual (la API reinicia la cuota a medianoche hora del Pacífico)"""
+        return datetime.now(QUOTA_TIMEZONE).strftime('%Y-%m-%d')
+
+    def _reserve(self, endpoint, units, floor):
+        """
+        Carga las unidades solo si el gasto del día no supera daily_budget - floor
+        Lectura y escritura van en la misma transacción con el lock de escritura:
+        dos workers no pueden pasar a la vez el último hueco del presupuesto
+        Retorna (reservado, unidades restantes antes de reservar)
+        """
+        day = self.quota_day()
+        limit = self.daily_budget - floor
+        conn = self._shared.get()
+        if conn is not None:
+            try:
+                with conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    spent = conn.execute('SELECT COALESCE(SUM(units), 0) FROM quota_usage WHERE day = ?',
+                                         (day,)).fetchone()[0]
+                    reserved = spent + units <= limit
+                    if reserved:
+                        conn.execute('''
+                            INSERT INTO quota_usage (day, endpoint, units) VALUES (?, ?, ?)
+                            ON CONFLICT (day, endpoint) DO UPDATE SET units = units + excluded.units
+                        ''', (day, endpoint, units))
+                return reserved, max(0, self.daily_budget - spent)
+            except sqlite3.Error as e:
+                print(f"Error registrando cuota: {e}")
+
+        with self._cond:
+            usage = self._local_usage.setdefault(day, {})
+            spent = sum(usage.values())
+            reserved = spent + units <= limit
+            if reserved:
+                usage[endpoint] = usage.get(endpoint, 0) + units
+            return reserved, max(0, self.daily_budget - spent)
+
+    def _charge(self, endpoint, units):
+        day = self.quota_day()
+        conn = self._shared.get()
+        if conn is not None:
+            try:
+                conn.execute('''
+                    INSERT INTO quota_usage (day, endpoint, units) VALUES (?, ?, ?)
+                    ON CONFLICT (day, endpoint) DO UPDATE SET units = units + excluded.units
+                ''', (day, endpoint, units))
+                return
+            except sqlite3.Error as e:
+                print(f"Error registrando cuota: {e}")
+
+        with self._cond:
+            usage = self._local_usage.setdefault(day, {})
+            usage[endpoint] = usage.get(endpoint, 0) + units
+
+    def mark_exhausted(self):
+        """La API respondió quotaExceeded: se da por agotado el presupuesto del día"""
+        spent = sum(self.usage().values())
+        if spent < self.daily_budget:
+            self._charge('exhausted', self.daily_budget - spent)
+
+    def usage(self):
+        """Unidades gastadas hoy por endpoint"""
+        day = self.quota_day()
+        conn = self._shared.get()
+        if conn is not None:
+            try:
+                rows = conn.execute('SELECT endpoint, units FROM quota_usage WHERE day = ?', (day,)).fetchall()
+                return dict(rows)
+            except sqlite3.Error as e:
+                print(f"Error leyendo cuota: {e}")
+
+        with self._cond:
+            return dict(self._local_usage.get(day, {}))
+
+    def remaining(self):
+        """Unidades de cuota restantes hoy"""
+        return max(0, self.daily_budget - sum(self.usage().values()))
+
+    def _count(self, name):
+        with self._cond:
+            self._stats[name] += 1
+
+    def status(self):
+        """Presupuesto, gasto por endpoint y contadores del planificador"""
+        usage = self.usage()
+        spent = sum(usage.values())
+        with self._cond:
+            stats = dict(self._stats)
+        stats['tokens'] = round(self.tokens(), 2)
+        return {
+            'day': self.quota_day(),
+            'budget': self.daily_budget,
+            'spent': spent,
+            'remaining': max(0, self.daily_budget - spent),
+            'background_reserve': self.background_reserve,
+            'by_endpoint': usage,
+            'max_qps': self.max_qps,
+            'scheduler': stats,
+        }
+
+
+quota_scheduler = QuotaScheduler()
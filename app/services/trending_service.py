@@ -0,0 +1,161 @@
+# ==================================================
+# ARCHIVO: app/services/trending_service.py
+# ==================================================
+
+"""
+Feed de tendencias precalculado
+Un hilo en segundo plano refresca el snapshot cada cierto intervalo y lo
+publica en el caché compartido; el dashboard solo lee ese snapshot
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from app.services.cache_service import ResponseCache
+
+SNAPSHOT_KEY = 'snapshot'
+
+# Solo nivel compartido: cada worker mantiene su propia copia en el refresher
+trending_cache = ResponseCache('trending', max_entries=1, ttl=86400, local_ttl=0)
+
+
+class TrendingRefresher:
+    """
+    Mantiene en memoria el último snapshot de tendencias
+    Si otro worker ya refrescó el snapshot compartido, se adopta sin llamar a la API
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.interval = 1800
+        self.query = 'tutorial web development'
+        self.max_results = 24
+
+        self._app = None
+        self._videos = []
+        self._refreshed_at = None
+        self._last_attempt_at = None
+        self._last_outcome = 'pending'
+        self._last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+
+    def init_app(self, app):
+        """Configura el refresco y arranca el hilo si está habilitado"""
+        self._app = app
+        self.interval = app.config.get('TRENDING_REFRESH_INTERVAL', self.interval)
+        self.query = app.config.get('TRENDING_QUERY', self.query)
+        self.max_results = app.config.get('TRENDING_MAX_RESULTS', self.max_results)
+        self.enabled = self.interval > 0 and bool(app.config.get('YOUTUBE_API_KEY'))
+
+        trending_cache.init_app(app)
+        # El snapshot compartido debe sobrevivir a varios intervalos de refresco
+        trending_cache.ttl = max(self.interval * 4, 3600)
+        trending_cache.stale_ttl = 0
+
+        if self.enabled and app.config.get('TRENDING_REFRESH_AUTOSTART', True):
+            self.start()
+
+    # ==========================
+    # Hilo de refresco
+    # ==========================
+    def start(self):
+        """Arranca el hilo de refresco en el proceso actual (idempotente)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='trending-refresher', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo de refresco"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._app.app_context():
+                self.refresh()
+            self._stop.wait(self.interval)
+
+    def refresh(self, force=False):
+        """
+        Refresca el snapshot; si el compartido sigue vigente lo adopta
+        Retorna True si hay un snapshot utilizable tras la llamada
+        """
+        from app.services.youtube_service import fetch_search
+        from app.services.youtube_client import NOT_MODIFIED
+        from app.services.quota_scheduler import BACKGROUND
+
+        now = time.time()
+        shared = trending_cache.get(SNAPSHOT_KEY)
+        if not force and shared and now - shared['refreshed_at'] < self.interval:
+            self._publish(shared['videos'], shared['refreshed_at'], 'shared', None)
+            return True
+
+        self._last_attempt_at = now
+        # Con el etag del snapshot anterior, un 304 confirma los mismos videos
+        etag = shared.get('etag') if shared else None
+        try:
+            page = fetch_search(self.query, self.max_results, priority=BACKGROUND, etag=etag)
+        except Exception as e:
+            print(f"Error refrescando tendencias: {e}")
+            with self._lock:
+                self._last_outcome = 'error'
+                self._last_error = str(e)
+            # Si otro worker dejó un snapshot, es mejor que nada
+            if shared and not self._videos:
+                self._publish(shared['videos'], shared['refreshed_at'], 'error', str(e))
+            return bool(self._videos)
+
+        if page is NOT_MODIFIED:
+            page = {'videos': shared['videos'], 'etag': etag}
+        videos = page['videos']
+        trending_cache.set(SNAPSHOT_KEY, {'videos': videos, 'refreshed_at': now, 'etag': page.get('etag')})
+        self._publish(videos, now, 'ok', None)
+        return True
+
+    def _publish(self, videos, refreshed_at, outcome, error):
+        with self._lock:
+            self._videos = videos
+            self._refreshed_at = refreshed_at
+            self._last_outcome = outcome
+            self._last_error = error
+
+    # ==========================
+    # Lectura
+    # ==========================
+    def get_videos(self, max_results=12):
+        """Videos del snapshot actual (lista vacía si aún no hay snapshot)"""
+        with self._lock:
+            return self._videos[:max_results]
+
+    def is_stale(self):
+        """True si el snapshot tiene más de dos intervalos (los refrescos están fallando)"""
+        with self._lock:
+            refreshed_at = self._refreshed_at
+        return refreshed_at is not None and time.time() - refreshed_at > self.interval * 2
+
+    def status(self):
+        """Edad del snapshot y resultado del último refresco"""
+        with self._lock:
+            refreshed_at = self._refreshed_at
+            status = {
+                'enabled': self.enabled,
+                'interval': self.interval,
+                'videos': len(self._videos),
+                'last_outcome': self._last_outcome,
+                'last_error': self._last_error,
+            }
+        status['age_seconds'] = round(time.time() - refreshed_at, 1) if refreshed_at else None
+        status['refreshed_at'] = datetime.utcfromtimestamp(refreshed_at).isoformat() + 'Z' if refreshed_at else None
+        status['last_attempt_at'] = (datetime.utcfromtimestamp(self._last_attempt_at).isoformat() + 'Z'
+                                     if self._last_attempt_at else None)
+        return status
+
+
+trending_refresher = TrendingRefresher()
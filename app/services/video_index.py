@@ -0,0 +1,232 @@
+# ==================================================
+# ARCHIVO: app/services/video_index.py
+# ==================================================
+
+"""
+Índice local de texto completo (SQLite FTS5) de todos los videos vistos
+Se alimenta de forma incremental con los resultados de búsqueda y los
+favoritos, y permite responder búsquedas repetidas sin llamar a la API
+"""
+import os
+import re
+import sqlite3
+import time
+
+from app.services.cache_service import SharedConnection
+
+# Pesos bm25 por columna: el título pesa más que el canal y la descripción
+BM25_WEIGHTS = (10.0, 4.0, 1.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(text):
+    """
+    Convierte texto libre en una consulta FTS5 segura
+    Cada palabra se cita (sin operadores del usuario) y la última admite prefijo
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class VideoIndex:
+    """
+    Tabla de videos con un índice FTS5 de contenido externo sincronizado por triggers
+    y una tabla de propietarios para buscar dentro de los favoritos de cada usuario
+    """
+
+    def __init__(self):
+        self._shared = SharedConnection()
+        self.created = False
+
+    def init_app(self, app):
+        """Configura la ruta del índice y crea el esquema si no existe"""
+        db_name = app.config.get('VIDEO_INDEX_DB')
+        if not db_name:
+            self._shared.db_path = None
+            return
+        os.makedirs(app.instance_path, exist_ok=True)
+        self._shared.db_path = os.path.join(app.instance_path, db_name)
+        self._ensure_schema()
+
+    @property
+    def enabled(self):
+        return self._shared.db_path is not None
+
+    def _ensure_schema(self):
+        conn = self._shared.get()
+        if conn is None:
+            return
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'videos'"
+        ).fetchone()
+        self.created = exists is None
+
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS videos (
+                rowid INTEGER PRIMARY KEY,
+                video_id TEXT NOT NULL UNIQUE,
+                title TEXT NOT NULL DEFAULT '',
+                channel TEXT NOT NULL DEFAULT '',
+                description TEXT NOT NULL DEFAULT '',
+                thumbnail TEXT NOT NULL DEFAULT '',
+                indexed_at REAL NOT NULL
+            );
+
+            CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+                title, channel, description,
+                content='videos', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2'
+            );
+
+            CREATE TRIGGER IF NOT EXISTS videos_ai AFTER INSERT ON videos BEGIN
+                INSERT INTO videos_fts (rowid, title, channel, description)
+                VALUES (new.rowid, new.title, new.channel, new.description);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS videos_ad AFTER DELETE ON videos BEGIN
+                INSERT INTO videos_fts (videos_fts, rowid, title, channel, description)
+                VALUES ('delete', old.rowid, old.title, old.channel, old.description);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS videos_au AFTER UPDATE ON videos BEGIN
+                INSERT INTO videos_fts (videos_fts, rowid, title, channel, description)
+                VALUES ('delete', old.rowid, old.title, old.channel, old.description);
+                INSERT INTO videos_fts (rowid, title, channel, description)
+                VALUES (new.rowid, new.title, new.channel, new.description);
+            END;
+
+            CREATE TABLE IF NOT EXISTS video_owners (
+                user_id INTEGER NOT NULL,
+                video_id TEXT NOT NULL,
+                PRIMARY KEY (user_id, video_id)
+            ) WITHOUT ROWID;
+        ''')
+
+    # ==========================
+    # Escritura
+    # ==========================
+    def index_videos(self, videos):
+        """Inserta o actualiza videos en el índice (ignora los que no cambiaron)"""
+        conn = self._shared.get()
+        if conn is None or not videos:
+            return
+        now = time.time()
+        rows = [
+            (video['id'], video.get('title') or '', video.get('channel') or '',
+             video.get('description') or '', video.get('thumbnail') or '', now)
+            for video in videos
+        ]
+        try:
+            with conn:
+                conn.execute('BEGIN')
+                conn.executemany('''
+                    INSERT INTO videos (video_id, title, channel, description, thumbnail, indexed_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (video_id) DO UPDATE SET
+                        title = excluded.title,
+                        channel = excluded.channel,
+                        description = excluded.description,
+                        thumbnail = excluded.thumbnail,
+                        indexed_at = excluded.indexed_at
+                    WHERE videos.title != excluded.title
+                       OR videos.channel != excluded.channel
+                       OR videos.description != excluded.description
+                       OR videos.thumbnail != excluded.thumbnail
+                ''', rows)
+        except sqlite3.Error as e:
+            print(f"Error indexando videos: {e}")
+
+    def add_favorites(self, user_id, videos):
+        """Indexa videos y los asocia a los favoritos del usuario"""
+        self.index_videos(videos)
+        conn = self._shared.get()
+        if conn is None or not videos:
+            return
+        try:
+            conn.executemany('INSERT OR IGNORE INTO video_owners (user_id, video_id) VALUES (?, ?)',
+                             [(user_id, video['id']) for video in videos])
+        except sqlite3.Error as e:
+            print(f"Error indexando favoritos: {e}")
+
+    def backfill_favorites(self, favorites, chunk_size=500):
+        """
+        Carga inicial de favoritos existentes: iterable de (user_id, video)
+        Se procesa por bloques para no cargar toda la tabla en memoria
+        """
+        chunk = {}
+        pending = 0
+        for user_id, video in favorites:
+            chunk.setdefault(user_id, []).append(video)
+            pending += 1
+            if pending >= chunk_size:
+                for owner, videos in chunk.items():
+                    self.add_favorites(owner, videos)
+                chunk = {}
+                pending = 0
+        for owner, videos in chunk.items():
+            self.add_favorites(owner, videos)
+
+    def remove_favorites(self, user_id, video_ids):
+        """Quita la asociación de favoritos (el video sigue indexado)"""
+        conn = self._shared.get()
+        if conn is None or not video_ids:
+            return
+        try:
+            conn.executemany('DELETE FROM video_owners WHERE user_id = ? AND video_id = ?',
+                             [(user_id, video_id) for video_id in video_ids])
+        except sqlite3.Error as e:
+            print(f"Error indexando favoritos: {e}")
+
+    # ==========================
+    # Búsqueda
+    # ==========================
+    def search(self, text, limit=12, offset=0, user_id=None):
+        """
+        Videos que coinciden con el texto, ordenados por bm25
+        Con user_id, solo dentro de los favoritos de ese usuario
+        """
+        conn = self._shared.get()
+        match = build_match_query(text)
+        if conn is None or match is None:
+            return []
+
+        sql = '''
+            SELECT v.video_id, v.title, v.channel, v.description, v.thumbnail
+            FROM videos_fts
+            JOIN videos v ON v.rowid = videos_fts.rowid
+        '''
+        params = []
+        if user_id is not None:
+            sql += ' JOIN video_owners o ON o.video_id = v.video_id AND o.user_id = ?'
+            params.append(user_id)
+        sql += ' WHERE videos_fts MATCH ? ORDER BY bm25(videos_fts, ?, ?, ?) LIMIT ? OFFSET ?'
+        params.extend([match, *BM25_WEIGHTS, limit, offset])
+
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error en búsqueda local: {e}")
+            return []
+
+        return [
+            {'id': row[0], 'title': row[1], 'channel': row[2], 'description': row[3], 'thumbnail': row[4]}
+            for row in rows
+        ]
+
+    def stats(self):
+        """Número de videos indexados y de asociaciones de favoritos"""
+        conn = self._shared.get()
+        if conn is None:
+            return {'videos': 0, 'favorites': 0}
+        return {
+            'videos': conn.execute('SELECT COUNT(*) FROM videos').fetchone()[0],
+            'favorites': conn.execute('SELECT COUNT(*) FROM video_owners').fetchone()[0],
+        }
+
+
+video_index = VideoIndex()
@@ -0,0 +1,66 @@
+# ==================================================
+# ARCHIVO: app/services/warmup.py
+# ==================================================
+
+"""
+Calentamiento de la aplicación antes de aceptar tráfico
+En producción se ejecuta una vez en el proceso maestro de gunicorn (con
+preload_app) para que los workers hereden por copy-on-write las plantillas
+compiladas y el snapshot de tendencias, en lugar de pagarlos en la primera
+petición de cada worker
+"""
+import time
+
+from sqlalchemy import text
+
+TEMPLATES = [
+    'base.html',
+    'components/navbar.html',
+    'auth/login.html',
+    'auth/register.html',
+    'home/dashboard.html',
+    'home/search.html',
+    'home/advanced_search.html',
+    'errors/404.html',
+    'errors/500.html',
+]
+
+
+def warm_up(app):
+    """
+    Compila las plantillas, abre la base de datos y carga las tendencias
+    Retorna los segundos empleados en cada paso; un paso que falla no
+    impide arrancar (se reintentará en la primera petición)
+    """
+    from app import db
+    from app.services.trending_service import trending_refresher
+
+    timings = {}
+
+    started = time.perf_counter()
+    for name in TEMPLATES:
+        try:
+            app.jinja_env.get_template(name)
+        except Exception as e:
+            print(f"Error precompilando plantilla {name}: {e}")
+    timings['templates'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with app.app_context():
+        try:
+            db.session.execute(text('SELECT 1 FROM users LIMIT 1'))
+        except Exception as e:
+            print(f"Error abriendo la base de datos: {e}")
+        finally:
+            db.session.remove()
+            # Las conexiones no deben cruzar el fork hacia los workers
+            db.engine.dispose()
+    timings['database'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if trending_refresher.enabled:
+        with app.app_context():
+            trending_refresher.refresh()
+    timings['trending'] = time.perf_counter() - started
+
+    return timings
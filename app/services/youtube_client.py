@@ -0,0 +1,280 @@
+# ==================================================
+# ARCHIVO: app/services/youtube_client.py
+# ==================================================
+
+"""
+Cliente HTTP único para la API de datos de YouTube
+Mantiene una sesión keep-alive por worker con pool de conexiones,
+reintentos acotados con backoff y jitter, circuit breaker, peticiones
+condicionales con ETag y métricas por endpoint
+"""
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.services.metrics import metrics
+from app.services.quota_scheduler import quota_scheduler, INTERACTIVE, QuotaExceededError, RateLimitedError
+from app.utils.circuit_breaker import CircuitBreaker
+
+YOUTUBE_API_BASE = 'https://www.googleapis.com/youtube/v3'
+
+# Códigos HTTP que se consideran transitorios y se reintentan
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Motivos de error 403 que indican cuota agotada
+QUOTA_REASONS = {'quotaExceeded', 'dailyLimitExceeded'}
+
+# Resultado de una petición condicional cuyo contenido no cambió (HTTP 304)
+NOT_MODIFIED = object()
+
+# Tamaños de cuerpo recordados por ETag para estimar los bytes ahorrados por los 304
+ETAG_SIZES_MAX = 4096
+
+
+class YouTubeClient:
+    """
+    Cliente compartido por todo el proceso
+    La sesión se crea de forma perezosa y se vuelve a crear tras un fork
+    """
+
+    def __init__(self):
+        self.base_url = YOUTUBE_API_BASE
+        self.pool_size = 10
+        self.connect_timeout = 3.05
+        self.read_timeout = 10
+        self.max_retries = 2
+        self.backoff_base = 0.25
+        self.backoff_max = 4.0
+
+        self.breaker = CircuitBreaker('youtube')
+
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._etag_sizes = OrderedDict()
+
+    def init_app(self, app):
+        """Configura el cliente a partir de la configuración de la app"""
+        self.base_url = app.config.get('YOUTUBE_API_BASE', self.base_url).rstrip('/')
+        self.pool_size = app.config.get('YOUTUBE_POOL_SIZE', self.pool_size)
+        self.connect_timeout = app.config.get('YOUTUBE_CONNECT_TIMEOUT', self.connect_timeout)
+        self.read_timeout = app.config.get('YOUTUBE_READ_TIMEOUT', self.read_timeout)
+        self.max_retries = app.config.get('YOUTUBE_MAX_RETRIES', self.max_retries)
+        self.backoff_base = app.config.get('YOUTUBE_BACKOFF_BASE', self.backoff_base)
+        self.backoff_max = app.config.get('YOUTUBE_BACKOFF_MAX', self.backoff_max)
+        self.breaker.configure(
+            error_threshold=app.config.get('YOUTUBE_BREAKER_ERROR_RATE'),
+            min_calls=app.config.get('YOUTUBE_BREAKER_MIN_CALLS'),
+            window=app.config.get('YOUTUBE_BREAKER_WINDOW'),
+            cooldown=app.config.get('YOUTUBE_BREAKER_COOLDOWN')
+        )
+        self.close()
+
+    # ==========================
+    # Sesión
+    # ==========================
+    @property
+    def session(self):
+        """Sesión keep-alive del proceso actual"""
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._lock:
+                if self._session is None or self._session_pid != pid:
+                    self._session = self._build_session()
+                    self._session_pid = pid
+        return self._session
+
+    def _build_session(self):
+        session = requests.Session()
+        # Los reintentos se gestionan aquí para poder medirlos y aplicar jitter
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                              max_retries=0, pool_block=False)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+        })
+        return session
+
+    def close(self):
+        """Cierra la sesión actual; la siguiente petición abrirá una nueva"""
+        with self._lock:
+            if self._session is not None and self._session_pid == os.getpid():
+                self._session.close()
+            self._session = None
+            self._session_pid = None
+
+    # ==========================
+    # Peticiones
+    # ==========================
+    def get(self, endpoint, params, priority=INTERACTIVE, etag=None):
+        """
+        GET a un endpoint de la API (ej. 'search', 'videos')
+        Cada intento pide turno al planificador de cuota con la prioridad indicada
+        Con etag se envía If-None-Match y, si el contenido no cambió, retorna NOT_MODIFIED
+        Retorna el JSON decodificado; lanza requests.RequestException si falla,
+        QuotaExceededError/RateLimitedError si el planificador lo rechaza
+        o CircuitOpenError si el circuito está abierto
+        """
+        self.breaker.before_call()
+        try:
+            data = self._get_with_retries(endpoint, params, priority, etag)
+        except (QuotaExceededError, RateLimitedError):
+            self.breaker.cancel()
+            raise
+        except requests.HTTPError as e:
+            # Un 4xx es un error de la petición, no de salud del servicio
+            if e.response is not None and e.response.status_code in RETRY_STATUSES:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except (requests.RequestException, ValueError):
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_success()
+        return data
+
+    def _get_with_retries(self, endpoint, params, priority, etag=None):
+        url = f'{self.base_url}/{endpoint}'
+        timeout = (self.connect_timeout, self.read_timeout)
+        headers = {'If-None-Match': self._quote_etag(etag)} if etag else None
+        attempt = 0
+
+        while True:
+            quota_scheduler.acquire(endpoint, priority)
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(endpoint, time.perf_counter() - started, 0, 'error')
+                if attempt >= self.max_retries:
+                    raise
+                self._sleep_backoff(endpoint, attempt)
+                attempt += 1
+                continue
+
+            elapsed = time.perf_counter() - started
+            body_size = len(response.content)
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                self._record(endpoint, elapsed, body_size, response.status_code)
+                self._sleep_backoff(endpoint, attempt, response.headers.get('Retry-After'))
+                attempt += 1
+                continue
+
+            self._record(endpoint, elapsed, body_size, response.status_code)
+            if response.status_code == 403 and self._is_quota_error(response):
+                quota_scheduler.mark_exhausted()
+            response.raise_for_status()
+
+            if etag:
+                self._record_conditional(endpoint, etag, response.status_code == 304)
+            if response.status_code == 304:
+                return NOT_MODIFIED
+
+            data = response.json()
+            self._remember_size(data.get('etag') or response.headers.get('ETag'), body_size)
+            return data
+
+    @staticmethod
+    def _quote_etag(etag):
+        """Los ETag del cuerpo JSON vienen sin comillas; la cabecera las requiere"""
+        if etag.startswith('"') or etag.startswith('W/'):
+            return etag
+        return f'"{etag}"'
+
+    def _remember_size(self, etag, body_size):
+        if not etag:
+            return
+        key = etag.strip('"')
+        with self._lock:
+            self._etag_sizes[key] = body_size
+            self._etag_sizes.move_to_end(key)
+            while len(self._etag_sizes) > ETAG_SIZES_MAX:
+                self._etag_sizes.popitem(last=False)
+
+    def _record_conditional(self, endpoint, etag, not_modified):
+        with self._lock:
+            stats = self._endpoint_stats(endpoint)
+            stats['conditional_requests'] += 1
+            if not_modified:
+                stats['not_modified'] += 1
+                stats['bytes_saved'] += self._etag_sizes.get(etag.strip('"'), 0)
+
+    @staticmethod
+    def _is_quota_error(response):
+        try:
+            errors = response.json().get('error', {}).get('errors', [])
+        except ValueError:
+            return False
+        return any(error.get('reason') in QUOTA_REASONS for error in errors)
+
+    def _sleep_backoff(self, endpoint, attempt, retry_after=None):
+        """Backoff exponencial con jitter completo; respeta Retry-After si es menor al máximo"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.backoff_max))
+            except ValueError:
+                pass
+
+        with self._lock:
+            self._endpoint_stats(endpoint)['retries'] += 1
+        time.sleep(delay)
+
+    # ==========================
+    # Métricas
+    # ==========================
+    def _endpoint_stats(self, endpoint):
+        """Contadores del endpoint; el llamador debe tener el lock"""
+        stats = self._stats.get(endpoint)
+        if stats is None:
+            stats = self._stats[endpoint] = {
+                'requests': 0,
+                'errors': 0,
+                'retries': 0,
+                'bytes_received': 0,
+                'conditional_requests': 0,
+                'not_modified': 0,
+                'bytes_saved': 0,
+                'total_seconds': 0.0,
+                'max_seconds': 0.0,
+                'last_seconds': 0.0,
+            }
+        return stats
+
+    def _record(self, endpoint, elapsed, body_size, status):
+        """Un intento HTTP; status es el código de respuesta o 'error' si no hubo respuesta"""
+        error = status == 'error' or status >= 400
+        metrics.observe_upstream(endpoint, status, elapsed)
+        with self._lock:
+            stats = self._endpoint_stats(endpoint)
+            stats['requests'] += 1
+            stats['bytes_received'] += body_size
+            stats['total_seconds'] += elapsed
+            stats['last_seconds'] = elapsed
+            stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+            if error:
+                stats['errors'] += 1
+
+    def stats(self):
+        """Copia de las métricas por endpoint, con latencia media y tasa de 304"""
+        with self._lock:
+            result = {endpoint: dict(values) for endpoint, values in self._stats.items()}
+        for values in result.values():
+            values['avg_seconds'] = values['total_seconds'] / values['requests'] if values['requests'] else 0.0
+            values['not_modified_rate'] = (values['not_modified'] / values['conditional_requests']
+                                           if values['conditional_requests'] else 0.0)
+        return result
+
+
+youtube_client = YouTubeClient()
@@ -3,11 +3,19 @@
 # ACCIÓN: REEMPLAZAR TODO EL CONTENIDO
 # ==================================================
 
-import requests
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import isodate
 from flask import current_app
-from datetime import datetime, timedelta
-
-YOUTUBE_API_BASE = 'https://www.googleapis.com/youtube/v3'
+from datetime import datetime, timedelta, timezone
+from app.services.cache_service import search_cache, video_cache, stats_cache, make_cache_key
+from app.services.youtube_client import youtube_client, NOT_MODIFIED
+from app.services.video_index import video_index
+from app.services.quota_scheduler import INTERACTIVE, BACKGROUND
+from app.utils.singleflight import SingleFlight
+from app.utils.circuit_breaker import CLOSED
 
 CATEGORY_MAP = {
     'education': '27',
@@ -18,58 +26,123 @@ CATEGORY_MAP = {
     'sports': '17'
 }
 
-def search_videos(query, max_results=12):
-    """Búsqueda simple de videos en YouTube"""
+# Granularidad (segundos) con la que se redondea publishedAfter para que
+# búsquedas con el mismo filtro de fecha compartan entrada de caché
+DATE_FILTER_BUCKETS = {
+    'hour': 300,
+    'today': 3600,
+    'week': 3600,
+    'month': 86400,
+    'year': 86400
+}
+
+# Máximo de IDs que acepta videos.list por petición
+VIDEOS_BATCH_SIZE = 50
+
+# Máscaras de respuesta parcial (parámetro fields): solo se piden los campos que se usan
+SEARCH_FIELDS = ('etag,nextPageToken,prevPageToken,'
+                 'items(id/videoId,snippet(title,channelTitle,description,thumbnails/medium/url))')
+DETAILS_FIELDS = ('etag,items(snippet(title,channelTitle,description,thumbnails/high/url),'
+                  'statistics(viewCount,likeCount))')
+STATS_FIELDS = 'items(id,statistics(viewCount,likeCount),contentDetails/duration)'
+
+# Agrupa llamadas concurrentes idénticas en una sola petición a la API
+upstream_flight = SingleFlight()
+
+# Revalidación en segundo plano de entradas vencidas (pool por proceso)
+_revalidation = {'pool': None, 'pid': None, 'keys': set(), 'lock': threading.Lock()}
+revalidation_stats = {'scheduled': 0, 'succeeded': 0, 'failed': 0}
+
+class VideoList(list):
+    """
+    Lista de videos con metadatos de la respuesta
+    stale=True indica que viene de caché vencido mientras se revalida
+    degraded=True indica además que YouTube está fallando (circuito no cerrado),
+    no un simple vencimiento del TTL
+    next_page_token / prev_page_token son los tokens de página de YouTube
+    """
+    def __init__(self, videos=(), stale=False, next_page_token=None, prev_page_token=None, degraded=False):
+        super().__init__(videos)
+        self.stale = stale
+        self.degraded = degraded
+        self.next_page_token = next_page_token
+        self.prev_page_token = prev_page_token
+    
+    @classmethod
+    def from_page(cls, page, stale=False):
+        return cls(page['videos'], stale=stale, degraded=stale and _upstream_degraded(),
+                   next_page_token=page.get('next_page_token'),
+                   prev_page_token=page.get('prev_page_token'))
+
+def search_videos(query, max_results=12, page_token=None):
+    """Búsqueda simple de videos en YouTube (una página)"""
     api_key = current_app.config.get('YOUTUBE_API_KEY')
     
     if not api_key:
-        return []
+        return VideoList()
+    
+    cache_key = make_cache_key('search', query, max_results, page_token)
     
     try:
-        url = f'{YOUTUBE_API_BASE}/search'
-        params = {
-            'q': query,
-            'part': 'snippet',
-            'maxResults': max_results,
-            'type': 'video',
-            'key': api_key,
-            'order': 'relevance'
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        videos = []
-        for item in data.get('items', []):
-            video = {
-                'id': item['id']['videoId'],
-                'title': item['snippet']['title'],
-                'thumbnail': item['snippet']['thumbnails']['medium']['url'],
-                'channel': item['snippet']['channelTitle'],
-                'description': item['snippet']['description']
-            }
-            videos.append(video)
-        
-        return videos
+        page, fresh = _load_through_cache(
+            search_cache, cache_key,
+            lambda priority, etag=None: fetch_search(query, max_results, priority=priority,
+                                                     page_token=page_token, etag=etag)
+        )
+        return VideoList.from_page(page, stale=not fresh)
     except Exception as e:
         print(f"Error buscando videos: {e}")
-        return []
+        return VideoList()
+
+def fetch_search(query, max_results=12, priority=INTERACTIVE, page_token=None, etag=None):
+    """
+    Búsqueda simple directa contra la API, sin caché
+    Retorna {'videos', 'next_page_token', 'prev_page_token', 'etag'}, o NOT_MODIFIED
+    si se pasó el etag de la página anterior y no cambió
+    Lanza la excepción del cliente o del planificador si la llamada falla
+    """
+    params = {
+        'q': query,
+        'part': 'snippet',
+        'fields': SEARCH_FIELDS,
+        'maxResults': max_results,
+        'type': 'video',
+        'key': current_app.config.get('YOUTUBE_API_KEY'),
+        'order': 'relevance'
+    }
+    
+    if page_token:
+        params['pageToken'] = page_token
+    
+    return _fetch_search_page(params, priority, etag)
+
+def _fetch_search_page(params, priority, etag):
+    data = youtube_client.get('search', params, priority=priority, etag=etag)
+    if data is NOT_MODIFIED:
+        return data
+    page = _parse_search_page(data)
+    video_index.index_videos(page['videos'])
+    return page
 
-def advanced_search_videos(query='', category='', duration='', date_filter='', order='relevance', max_results=12):
-    """Búsqueda avanzada de videos con filtros"""
+def advanced_search_videos(query='', category='', duration='', date_filter='', order='relevance', max_results=12,
+                           page_token=None):
+    """Búsqueda avanzada de videos con filtros (una página)"""
     api_key = current_app.config.get('YOUTUBE_API_KEY')
     
     if not api_key:
-        return []
+        return VideoList()
     
-    try:
-        url = f'{YOUTUBE_API_BASE}/search'
+    date_bucket = _get_date_bucket(date_filter)
+    cache_key = make_cache_key('advanced', query, category, duration, date_filter,
+                               date_bucket, order, max_results, page_token)
+    
+    def fetch(priority, etag=None):
         search_query = query if query else (category if category else 'tutorial')
         
         params = {
             'q': search_query,
             'part': 'snippet',
+            'fields': SEARCH_FIELDS,
             'maxResults': max_results,
             'type': 'video',
             'key': api_key,
@@ -80,34 +153,157 @@ def advanced_search_videos(query='', category='', duration='', date_filter='', o
             params['videoDuration'] = duration
         
         if date_filter:
-            params['publishedAfter'] = _get_date_filter(date_filter)
+            params['publishedAfter'] = _get_date_filter(date_filter, now=date_bucket)
         
         if category and category in CATEGORY_MAP:
             params['videoCategoryId'] = CATEGORY_MAP[category]
         
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        videos = []
-        for item in data.get('items', []):
-            video = {
-                'id': item['id']['videoId'],
-                'title': item['snippet']['title'],
-                'thumbnail': item['snippet']['thumbnails']['medium']['url'],
-                'channel': item['snippet']['channelTitle'],
-                'description': item['snippet']['description']
-            }
-            videos.append(video)
+        if page_token:
+            params['pageToken'] = page_token
         
-        return videos
+        return _fetch_search_page(params, priority, etag)
+    
+    try:
+        page, fresh = _load_through_cache(search_cache, cache_key, fetch)
+        return VideoList.from_page(page, stale=not fresh)
     except Exception as e:
         print(f"Error en búsqueda avanzada: {e}")
-        return []
+        return VideoList()
+
+def search_local(query, max_results=12, offset=0, user_id=None):
+    """
+    Búsqueda en el índice local (bm25), sin llamar a la API
+    Con user_id busca solo dentro de los favoritos del usuario
+    """
+    return VideoList(video_index.search(query, limit=max_results, offset=offset, user_id=user_id))
+
+def iter_search_pages(query='', category='', duration='', date_filter='', order='relevance', page_size=12,
+                      page_token=None, max_pages=10):
+    """
+    Generador que recorre páginas sucesivas de la búsqueda avanzada bajo demanda
+    Cada página solo se pide a la API (o al caché) cuando el consumidor la solicita
+    Los videos repetidos entre páginas se descartan
+    """
+    seen = set()
+    for _ in range(max_pages):
+        page = advanced_search_videos(query=query, category=category, duration=duration,
+                                      date_filter=date_filter, order=order,
+                                      max_results=page_size, page_token=page_token)
+        unique = [video for video in page if video['id'] not in seen]
+        seen.update(video['id'] for video in unique)
+        
+        yield VideoList(unique, stale=page.stale, degraded=page.degraded,
+                        next_page_token=page.next_page_token,
+                        prev_page_token=page.prev_page_token)
+        
+        page_token = page.next_page_token
+        if not page_token:
+            return
 
-def _get_date_filter(filter_type):
+def _upstream_degraded():
+    """True si el circuito de YouTube está abierto o probando la recuperación"""
+    return youtube_client.breaker.state != CLOSED
+
+def _load_through_cache(cache, cache_key, loader):
+    """
+    Lee del caché y retorna (valor, fresco)
+    - Entrada vigente: se devuelve tal cual
+    - Entrada vencida dentro de la ventana de respaldo: se devuelve marcada como
+      no fresca y se programa su revalidación en segundo plano, condicionada a su etag
+    - Sin entrada: una sola de las llamadas concurrentes con la misma clave
+      ejecuta loader(prioridad) y las demás esperan su resultado
+    loader(prioridad, etag) puede retornar NOT_MODIFIED si se le pasó un etag
+    """
+    entry = cache.get_entry(cache_key)
+    if entry is not None:
+        value, fresh = entry
+        if not fresh:
+            _schedule_revalidation(cache, cache_key, loader, value)
+        return value, fresh
+    
+    timeout = current_app.config.get('YOUTUBE_SINGLEFLIGHT_TIMEOUT')
+    value = upstream_flight.do(cache_key, lambda: _store(cache, cache_key, loader(INTERACTIVE)),
+                               timeout=timeout)
+    return value, True
+
+def _store(cache, cache_key, value, previous=None):
+    # Un 304 confirma la entrada anterior: se vuelve a guardar para renovar su vigencia
+    if value is NOT_MODIFIED:
+        value = previous
+    if value is not None:
+        cache.set(cache_key, value)
+    return value
+
+def _schedule_revalidation(cache, cache_key, loader, previous):
+    """Refresca una entrada vencida en segundo plano (una sola vez por clave)"""
+    state = _revalidation
+    with state['lock']:
+        if cache_key in state['keys']:
+            return
+        # El pool no sobrevive a un fork: se crea uno por proceso
+        if state['pool'] is None or state['pid'] != os.getpid():
+            state['pool'] = ThreadPoolExecutor(max_workers=2, thread_name_prefix='yt-revalidate')
+            state['pid'] = os.getpid()
+            state['keys'] = set()
+        state['keys'].add(cache_key)
+        revalidation_stats['scheduled'] += 1
+    
+    app = current_app._get_current_object()
+    etag = previous.get('etag') if isinstance(previous, dict) else None
+    
+    def revalidate():
+        try:
+            with app.app_context():
+                upstream_flight.do(cache_key,
+                                   lambda: _store(cache, cache_key, loader(BACKGROUND, etag), previous))
+            result = 'succeeded'
+        except Exception as e:
+            result = 'failed'
+            print(f"Error revalidando caché: {e}")
+        # Los contadores se actualizan desde varios hilos del pool: siempre con el lock
+        with state['lock']:
+            revalidation_stats[result] += 1
+            state['keys'].discard(cache_key)
+    
+    state['pool'].submit(revalidate)
+
+def _parse_search_page(data):
+    """Página de search.list: videos, tokens de página y etag"""
+    return {
+        'videos': _parse_search_items(data),
+        'next_page_token': data.get('nextPageToken'),
+        'prev_page_token': data.get('prevPageToken'),
+        'etag': data.get('etag')
+    }
+
+def _parse_search_items(data):
+    """Convierte la respuesta de search.list en la lista de videos de la app"""
+    videos = []
+    for item in data.get('items', []):
+        video = {
+            'id': item['id']['videoId'],
+            'title': item['snippet']['title'],
+            'thumbnail': item['snippet']['thumbnails']['medium']['url'],
+            'channel': item['snippet']['channelTitle'],
+            'description': item['snippet']['description']
+        }
+        videos.append(video)
+    
+    return videos
+
+def _get_date_bucket(filter_type):
+    """Inicio del intervalo de tiempo vigente para el filtro de fecha (o None)"""
+    bucket = DATE_FILTER_BUCKETS.get(filter_type)
+    if not bucket:
+        return None
+    
+    # time.time() es siempre UTC; datetime.utcnow().timestamp() lo interpretaría como hora local
+    timestamp = int(time.time())
+    return datetime.fromtimestamp(timestamp - timestamp % bucket, timezone.utc)
+
+def _get_date_filter(filter_type, now=None):
     """Convierte el filtro de fecha en formato RFC 3339"""
-    now = datetime.utcnow()
+    now = now or datetime.utcnow()
     
     if filter_type == 'hour':
         date = now - timedelta(hours=1)
@@ -125,8 +321,17 @@ def _get_date_filter(filter_type):
     return date.strftime('%Y-%m-%dT%H:%M:%SZ')
 
 def get_trending_videos(max_results=12):
-    """Obtiene videos en tendencia"""
-    return search_videos('tutorial web development', max_results)
+    """
+    Obtiene videos en tendencia desde el snapshot precalculado
+    Si el refresco en segundo plano está desactivado, consulta la API en vivo
+    """
+    from app.services.trending_service import trending_refresher
+    
+    if trending_refresher.enabled:
+        # Un snapshot vencido significa que los refrescos están fallando
+        stale = trending_refresher.is_stale()
+        return VideoList(trending_refresher.get_videos(max_results), stale=stale, degraded=stale)
+    return search_videos(current_app.config.get('TRENDING_QUERY', 'tutorial web development'), max_results)
 
 def get_video_details(video_id):
     """Obtiene detalles de un video específico"""
@@ -135,17 +340,19 @@ def get_video_details(video_id):
     if not api_key:
         return None
     
-    try:
-        url = f'{YOUTUBE_API_BASE}/videos'
+    cache_key = make_cache_key('details', video_id)
+    
+    def fetch(priority, etag=None):
         params = {
             'id': video_id,
             'part': 'snippet,statistics',
+            'fields': DETAILS_FIELDS,
             'key': api_key
         }
         
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data = youtube_client.get('videos', params, priority=priority, etag=etag)
+        if data is NOT_MODIFIED:
+            return data
         
         if data.get('items'):
             item = data['items'][0]
@@ -156,9 +363,98 @@ def get_video_details(video_id):
                 'channel': item['snippet']['channelTitle'],
                 'description': item['snippet']['description'],
                 'views': item['statistics'].get('viewCount', 0),
-                'likes': item['statistics'].get('likeCount', 0)
+                'likes': item['statistics'].get('likeCount', 0),
+                'etag': data.get('etag')
             }
         return None
+    
+    try:
+        video, fresh = _load_through_cache(video_cache, cache_key, fetch)
+        if video is not None and not fresh:
+            video = dict(video, stale=True)
+        return video
     except Exception as e:
         print(f"Error obteniendo detalles del video: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def get_videos_statistics(video_ids, priority=INTERACTIVE):
+    """
+    Estadísticas y duración de varios videos: {video_id: {...}}
+    Los IDs ya vistos se sirven del caché por ID; el resto se pide en
+    lotes de hasta 50 IDs por llamada a videos.list (1 unidad por lote)
+    """
+    api_key = current_app.config.get('YOUTUBE_API_KEY')
+    
+    result = {}
+    stale = {}
+    missing = []
+    for video_id in dict.fromkeys(video_ids):
+        entry = stats_cache.get_entry(make_cache_key('stats', video_id))
+        if entry is not None and entry[1]:
+            result[video_id] = entry[0]
+        else:
+            if entry is not None:
+                stale[video_id] = entry[0]
+            missing.append(video_id)
+    
+    if not api_key:
+        missing = []
+    
+    for start in range(0, len(missing), VIDEOS_BATCH_SIZE):
+        batch = missing[start:start + VIDEOS_BATCH_SIZE]
+        params = {
+            'id': ','.join(batch),
+            'part': 'statistics,contentDetails',
+            'fields': STATS_FIELDS,
+            'maxResults': len(batch),
+            'key': api_key
+        }
+        
+        try:
+            data = youtube_client.get('videos', params, priority=priority)
+        except Exception as e:
+            print(f"Error obteniendo estadísticas de videos: {e}")
+            # Mejor datos algo viejos que ninguno
+            result.update({video_id: stale[video_id] for video_id in batch if video_id in stale})
+            continue
+        
+        fetched = {item['id']: _parse_statistics(item) for item in data.get('items', [])}
+        for video_id in batch:
+            # Los IDs sin resultado (borrados o privados) también se cachean para no repetirlos
+            stats = fetched.get(video_id, {})
+            stats_cache.set(make_cache_key('stats', video_id), stats)
+            result[video_id] = stats
+    
+    return result
+
+def enrich_videos(videos, priority=INTERACTIVE):
+    """
+    Devuelve copias de los videos con vistas, likes y duración añadidos
+    Conserva la marca stale y los tokens de página de la lista original
+    """
+    if not videos:
+        return videos
+    
+    statistics = get_videos_statistics([video['id'] for video in videos], priority=priority)
+    enriched = [dict(video, **statistics.get(video['id'], {})) for video in videos]
+    return VideoList(enriched, stale=getattr(videos, 'stale', False), degraded=getattr(videos, 'degraded', False),
+                     next_page_token=getattr(videos, 'next_page_token', None),
+                     prev_page_token=getattr(videos, 'prev_page_token', None))
+
+def _parse_statistics(item):
+    """Extrae estadísticas y duración de un item de videos.list"""
+    statistics = item.get('statistics', {})
+    stats = {
+        'views': int(statistics.get('viewCount', 0)),
+        'likes': int(statistics.get('likeCount', 0)),
+        'duration_seconds': None
+    }
+    
+    duration = item.get('contentDetails', {}).get('duration')
+    if duration:
+        try:
+            stats['duration_seconds'] = int(isodate.parse_duration(duration).total_seconds())
+        except (isodate.ISO8601Error, ValueError):
+            pass
+    
+    return stats
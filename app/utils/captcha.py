@@ -1,10 +1,27 @@
 """
 Utilidad para generar y validar CAPTCHA simple
 Sistema de verificación humana mediante operaciones matemáticas
+
+El reto viaja en un token firmado con la SECRET_KEY y con caducidad: el
+servidor no guarda nada por reto, así que cualquier worker puede validarlo.
+El token no contiene la respuesta sino un HMAC de ella, y cada token solo
+puede usarse una vez gracias a un caché acotado de tokens ya usados
 """
+import hashlib
+import hmac
 import random
-import string
-from datetime import datetime, timedelta
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+
+CAPTCHA_SALT = 'captcha'
+
+_random = random.SystemRandom()
 
 class SimpleCaptcha:
     """
@@ -15,7 +32,7 @@ class SimpleCaptcha:
     def generate():
         """
         Genera un CAPTCHA con una operación matemática simple
-        Retorna: (pregunta, respuesta_correcta, token)
+        Retorna: (pregunta, respuesta_correcta)
         """
         operations = [
             ('suma', '+', lambda a, b: a + b),
@@ -24,18 +41,18 @@ class SimpleCaptcha:
         ]
         
         # Seleccionar operación aleatoria
-        op_name, op_symbol, op_func = random.choice(operations)
+        op_name, op_symbol, op_func = _random.choice(operations)
         
         # Generar números según la operación
         if op_name == 'suma':
-            num1 = random.randint(1, 20)
-            num2 = random.randint(1, 20)
+            num1 = _random.randint(1, 20)
+            num2 = _random.randint(1, 20)
         elif op_name == 'resta':
-            num1 = random.randint(10, 30)
-            num2 = random.randint(1, num1)  # Asegurar resultado positivo
+            num1 = _random.randint(10, 30)
+            num2 = _random.randint(1, num1)  # Asegurar resultado positivo
         else:  # multiplicación
-            num1 = random.randint(2, 10)
-            num2 = random.randint(2, 10)
+            num1 = _random.randint(2, 10)
+            num2 = _random.randint(2, 10)
         
         # Calcular respuesta
         answer = op_func(num1, num2)
@@ -43,16 +60,7 @@ class SimpleCaptcha:
         # Generar pregunta
         question = f"¿Cuánto es {num1} {op_symbol} {num2}?"
         
-        # Generar token único
-        token = SimpleCaptcha._generate_token()
-        
-        return question, answer, token
-    
-    @staticmethod
-    def _generate_token():
-        """Genera un token único para el CAPTCHA"""
-        chars = string.ascii_letters + string.digits
-        return ''.join(random.choice(chars) for _ in range(16))
+        return question, answer
     
     @staticmethod
     def validate(user_answer, correct_answer):
@@ -65,50 +73,114 @@ class SimpleCaptcha:
             return False
 
 
-class CaptchaStore:
+class ReplayCache:
     """
-    Almacén temporal de CAPTCHAs en memoria
-    En producción, usar Redis o base de datos
+    Registro de tokens ya usados hasta que caducan
+    Con almacén compartido (SQLite bajo instance/) lo ven todos los workers;
+    sin él, un LRU en memoria del proceso. En ambos casos está acotado
     """
-    _store = {}
-    
-    @staticmethod
-    def save(token, answer, expires_minutes=5):
-        """Guarda un CAPTCHA con tiempo de expiración"""
-        expires_at = datetime.now() + timedelta(minutes=expires_minutes)
-        CaptchaStore._store[token] = {
-            'answer': answer,
-            'expires_at': expires_at
-        }
-    
-    @staticmethod
-    def get(token):
-        """Obtiene y elimina un CAPTCHA del almacén"""
-        captcha_data = CaptchaStore._store.get(token)
-        
-        if not captcha_data:
-            return None
-        
-        # Verificar expiración
-        if datetime.now() > captcha_data['expires_at']:
-            CaptchaStore.delete(token)
-            return None
-        
-        return captcha_data['answer']
-    
-    @staticmethod
-    def delete(token):
-        """Elimina un CAPTCHA del almacén"""
-        if token in CaptchaStore._store:
-            del CaptchaStore._store[token]
-    
-    @staticmethod
-    def cleanup_expired():
-        """Limpia CAPTCHAs expirados"""
-        now = datetime.now()
-        expired_tokens = [
-            token for token, data in CaptchaStore._store.items()
-            if now > data['expires_at']
-        ]
-        for token in expired_tokens:
-            CaptchaStore.delete(token)
\ No newline at end of file
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._used = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = None
+        self._writes = 0
+
+    def init_app(self, app):
+        """Configura el límite y el almacén compartido"""
+        from app.services.cache_service import SharedConnection, shared_db_path
+        self.max_entries = app.config.get('CAPTCHA_REPLAY_MAX_ENTRIES', self.max_entries)
+        self._shared = SharedConnection(shared_db_path(app))
+        conn = self._shared.get()
+        if conn is not None:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS captcha_used (
+                    nonce TEXT NOT NULL PRIMARY KEY,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+
+    def consume(self, nonce, expires_at):
+        """Marca el token como usado; retorna False si ya lo estaba"""
+        conn = self._shared.get() if self._shared is not None else None
+        if conn is not None:
+            try:
+                inserted = conn.execute('INSERT OR IGNORE INTO captcha_used (nonce, expires_at) VALUES (?, ?)',
+                                        (nonce, expires_at)).rowcount
+                self._writes += 1
+                if self._writes % 100 == 0:
+                    self._purge(conn)
+                return inserted == 1
+            except sqlite3.Error as e:
+                print(f"Error en caché de CAPTCHA: {e}")
+
+        now = time.time()
+        with self._lock:
+            while self._used and next(iter(self._used.values())) <= now:
+                self._used.popitem(last=False)
+            if nonce in self._used:
+                return False
+            self._used[nonce] = expires_at
+            while len(self._used) > self.max_entries:
+                self._used.popitem(last=False)
+        return True
+
+    def _purge(self, conn):
+        """Descarta los caducados y, si sobran filas, los que caducan antes"""
+        conn.execute('DELETE FROM captcha_used WHERE expires_at <= ?', (time.time(),))
+        conn.execute('''
+            DELETE FROM captcha_used WHERE nonce NOT IN (
+                SELECT nonce FROM captcha_used ORDER BY expires_at DESC LIMIT ?
+            )
+        ''', (self.max_entries,))
+
+
+captcha_replay_cache = ReplayCache()
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=CAPTCHA_SALT)
+
+
+def _answer_digest(nonce, answer):
+    key = current_app.config['SECRET_KEY']
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+    message = f'{nonce}:{int(answer)}'.encode('utf-8')
+    return hmac.new(key, message, hashlib.sha256).hexdigest()
+
+
+def issue_captcha():
+    """
+    Genera un reto nuevo
+    Retorna: (pregunta, token firmado)
+    """
+    question, answer = SimpleCaptcha.generate()
+    nonce = secrets.token_urlsafe(12)
+    token = _serializer().dumps({'n': nonce, 'h': _answer_digest(nonce, answer)})
+    return question, token
+
+
+def verify_captcha(token, user_answer):
+    """
+    Valida la respuesta contra el token
+    El token se consume en cualquier intento, correcto o no, para que no
+    se puedan probar varias respuestas con el mismo reto
+    """
+    ttl = current_app.config.get('CAPTCHA_TTL', 300)
+    try:
+        payload, issued_at = _serializer().loads(token, max_age=ttl, return_timestamp=True)
+    except (BadSignature, SignatureExpired):
+        return False
+    if not isinstance(payload, dict) or not payload.get('n') or not payload.get('h'):
+        return False
+
+    if not captcha_replay_cache.consume(payload['n'], issued_at.timestamp() + ttl):
+        return False
+
+    try:
+        digest = _answer_digest(payload['n'], user_answer)
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(digest, payload['h'])
@@ -0,0 +1,127 @@
+"""
+Circuit breaker para dependencias externas
+Cuando la tasa de errores en la ventana reciente supera el umbral, el circuito
+se abre y las llamadas fallan de inmediato; pasado el enfriamiento se deja
+pasar una llamada de prueba (semiabierto) para comprobar si se recuperó
+"""
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto y la llamada se rechaza sin intentarla"""
+
+
+class CircuitBreaker:
+    """
+    Uso: before_call() antes de intentar, y record_success() / record_failure() después
+    (o cancel() si finalmente no se intentó)
+    """
+
+    def __init__(self, name, error_threshold=0.5, min_calls=10, window=60, cooldown=30):
+        self.name = name
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._outcomes = deque()
+        self._lock = threading.Lock()
+        self._stats = {
+            'opened': 0,
+            'rejected': 0,
+            'probes': 0,
+        }
+
+    def configure(self, error_threshold=None, min_calls=None, window=None, cooldown=None):
+        """Ajusta los parámetros sin perder el estado actual"""
+        if error_threshold is not None:
+            self.error_threshold = error_threshold
+        if min_calls is not None:
+            self.min_calls = min_calls
+        if window is not None:
+            self.window = window
+        if cooldown is not None:
+            self.cooldown = cooldown
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now):
+        """Estado efectivo; el llamador debe tener el lock"""
+        if self._state == OPEN and now - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self):
+        """Lanza CircuitOpenError si la llamada no debe intentarse"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._stats['probes'] += 1
+                return
+            self._stats['rejected'] += 1
+        raise CircuitOpenError(f'Circuito {self.name} abierto: dependencia no disponible')
+
+    def cancel(self):
+        """La llamada autorizada no llegó a intentarse (ej. rechazada por cuota)"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._probe_in_flight = False
+                self._outcomes.clear()
+            self._add_outcome(True)
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._open(now)
+                return
+            self._add_outcome(False)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            total = len(self._outcomes)
+            if total >= self.min_calls and failures / total >= self.error_threshold:
+                self._open(now)
+
+    def _add_outcome(self, ok):
+        """Registra un resultado y descarta los que salen de la ventana"""
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def _open(self, now):
+        self._state = OPEN
+        self._opened_at = now
+        self._probe_in_flight = False
+        self._outcomes.clear()
+        self._stats['opened'] += 1
+
+    def stats(self):
+        """Estado actual y contadores de aperturas, rechazos y sondeos"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self._current_state(time.monotonic())
+            stats['window_calls'] = len(self._outcomes)
+            stats['window_failures'] = sum(1 for _, ok in self._outcomes if not ok)
+        return stats
@@ -0,0 +1,48 @@
+"""
+Configuración de SQLite para producción
+Aplica los PRAGMA de rendimiento y concurrencia en cada conexión nueva del pool:
+WAL permite lecturas mientras otro proceso escribe y busy_timeout hace que un
+escritor espere al lock en lugar de fallar con "database is locked"
+"""
+from sqlalchemy import event
+
+
+def sqlite_pragmas(config):
+    """PRAGMA a aplicar, en orden, según la configuración de la app"""
+    return [
+        ('journal_mode', config.get('SQLITE_JOURNAL_MODE', 'WAL')),
+        ('synchronous', config.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('busy_timeout', config.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        ('cache_size', config.get('SQLITE_CACHE_SIZE', -20000)),
+        ('mmap_size', config.get('SQLITE_MMAP_SIZE', 268435456)),
+        ('temp_store', 'MEMORY'),
+    ]
+
+
+def engine_options(config, database_uri):
+    """Opciones del engine (tamaño del pool, esperas y reciclado) para SQLALCHEMY_ENGINE_OPTIONS"""
+    if ':memory:' in database_uri:
+        # Base en memoria: SQLAlchemy usa un pool de una sola conexión
+        return {}
+    return {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 3600),
+        'pool_pre_ping': True,
+    }
+
+
+def configure_sqlite(engine, pragmas):
+    """Registra los PRAGMA para cada conexión que abra el engine (solo SQLite)"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
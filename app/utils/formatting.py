@@ -0,0 +1,28 @@
+"""
+Filtros de formato para las plantillas
+"""
+
+
+def format_count(value):
+    """Número compacto al estilo YouTube: 950, 1,2 K, 3,4 M"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return ''
+
+    for threshold, suffix in ((1_000_000_000, ' MM'), (1_000_000, ' M'), (1_000, ' K')):
+        if value >= threshold:
+            number = f'{value / threshold:.1f}'.rstrip('0').rstrip('.')
+            return number.replace('.', ',') + suffix
+    return str(value)
+
+
+def format_duration(seconds):
+    """Duración en segundos como m:ss o h:mm:ss"""
+    if seconds is None:
+        return ''
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f'{hours}:{minutes:02d}:{seconds:02d}'
+    return f'{minutes}:{seconds:02d}'
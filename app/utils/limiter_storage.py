@@ -0,0 +1,174 @@
+"""
+Almacén de Flask-Limiter sobre un archivo SQLite local
+Los contadores viven en un archivo compartido (modo WAL) en lugar de la
+memoria del proceso: todos los workers ven los mismos límites y sobreviven
+a un reinicio, sin necesidad de un servidor externo
+
+Se registra en limits con el esquema sqlite:// al importar este módulo:
+    sqlite:///ruta/relativa.db    sqlite:////ruta/absoluta.db
+
+Soporta la estrategia moving-window (una fila por petición admitida con su
+instante de caducidad) y fixed-window (un contador por clave)
+"""
+import sqlite3
+import time
+
+from limits.storage import Storage, MovingWindowSupport
+
+from app.services.cache_service import SharedConnection
+
+PURGE_EVERY = 1000
+
+
+class SQLiteStorage(Storage, MovingWindowSupport):
+    """
+    Almacén de límites compartido entre procesos
+    Cada operación es una sola sentencia o una transacción corta con el lock
+    de escritura (BEGIN IMMEDIATE), así que dos workers no pueden admitir a
+    la vez la última petición de una ventana
+    """
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        self.db_path = uri[len('sqlite:///'):]
+        self._shared = SharedConnection(self.db_path)
+        self._writes = 0
+        # Las tablas se crean en la primera conexión que funcione: si el archivo
+        # no se puede abrir, la app arranca igual y check() retorna False, así
+        # que Flask-Limiter pasa a su almacén en memoria hasta que se recupere
+        self._tables_ready = False
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        conn = self._shared.get()
+        if conn is None:
+            raise sqlite3.OperationalError(f'No se pudo abrir el almacén de límites: {self.db_path}')
+        if not self._tables_ready:
+            self._create_tables(conn)
+            self._tables_ready = True
+        return conn
+
+    @staticmethod
+    def _create_tables(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ratelimit_entries (
+                key TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_ratelimit_entries_key ON ratelimit_entries (key, expires_at)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ratelimit_counters (
+                key TEXT NOT NULL PRIMARY KEY,
+                value INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+
+    # ==========================
+    # Ventana fija
+    # ==========================
+    def incr(self, key, expiry, amount=1, elastic_expiry=False):
+        """Suma amount al contador (reiniciándolo si caducó) y retorna el valor nuevo"""
+        now = time.time()
+        conn = self._connection()
+        value = conn.execute('''
+            INSERT INTO ratelimit_counters (key, value, expires_at) VALUES (?1, ?2, ?3)
+            ON CONFLICT (key) DO UPDATE SET
+                value = CASE WHEN expires_at <= ?4 THEN excluded.value ELSE value + excluded.value END,
+                expires_at = CASE WHEN expires_at <= ?4 OR ?5 THEN excluded.expires_at ELSE expires_at END
+            RETURNING value
+        ''', (key, amount, now + expiry, now, int(bool(elastic_expiry)))).fetchone()[0]
+        self._after_write(conn, now)
+        return value
+
+    def get(self, key):
+        """Valor actual del contador (0 si no existe o caducó)"""
+        row = self._connection().execute(
+            'SELECT value FROM ratelimit_counters WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        """Instante en que se reinicia el contador"""
+        row = self._connection().execute(
+            'SELECT expires_at FROM ratelimit_counters WHERE key = ?', (key,)
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    # ==========================
+    # Ventana deslizante
+    # ==========================
+    def acquire_entry(self, key, limit, expiry, amount=1):
+        """Registra amount peticiones si caben en la ventana; retorna False si no"""
+        if amount > limit:
+            return False
+
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Las entradas fuera de la ventana ya no cuentan; se borran en la purga periódica
+            count = conn.execute('SELECT COUNT(*) FROM ratelimit_entries WHERE key = ? AND expires_at > ?',
+                                 (key, now)).fetchone()[0]
+            acquired = count + amount <= limit
+            if acquired:
+                conn.executemany('INSERT INTO ratelimit_entries (key, expires_at) VALUES (?, ?)',
+                                 [(key, now + expiry)] * amount)
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+
+        if acquired:
+            self._after_write(conn, now)
+        return acquired
+
+    def get_moving_window(self, key, limit, expiry):
+        """(inicio de la ventana, peticiones en ella)"""
+        now = time.time()
+        oldest, count = self._connection().execute(
+            'SELECT MIN(expires_at), COUNT(*) FROM ratelimit_entries WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        if not count:
+            return now, 0
+        return oldest - expiry, count
+
+    # ==========================
+    # Mantenimiento
+    # ==========================
+    def check(self):
+        """True si el archivo responde"""
+        try:
+            self._connection().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        """Borra todos los límites y retorna cuántas filas había"""
+        conn = self._connection()
+        removed = conn.execute('DELETE FROM ratelimit_entries').rowcount
+        removed += conn.execute('DELETE FROM ratelimit_counters').rowcount
+        return removed
+
+    def clear(self, key):
+        """Borra el límite de una clave"""
+        conn = self._connection()
+        conn.execute('DELETE FROM ratelimit_entries WHERE key = ?', (key,))
+        conn.execute('DELETE FROM ratelimit_counters WHERE key = ?', (key,))
+
+    def _after_write(self, conn, now):
+        # Las claves que dejan de recibir peticiones se limpian de vez en cuando
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            try:
+                conn.execute('DELETE FROM ratelimit_entries WHERE expires_at <= ?', (now,))
+                conn.execute('DELETE FROM ratelimit_counters WHERE expires_at <= ?', (now,))
+            except sqlite3.Error as e:
+                print(f"Error limpiando límites caducados: {e}")
@@ -0,0 +1,27 @@
+"""
+Cursores de paginación opacos
+El contenido se firma con la SECRET_KEY para que el cliente no pueda
+fabricarlos ni modificarlos; un cursor inválido se trata como ausente
+"""
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+
+
+def _serializer(salt):
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt=salt)
+
+
+def encode_cursor(payload, salt):
+    """Serializa y firma un dict como cursor apto para URL"""
+    return _serializer(salt).dumps(payload)
+
+
+def decode_cursor(cursor, salt):
+    """Devuelve el dict del cursor, o None si falta o no es válido"""
+    if not cursor:
+        return None
+    try:
+        payload = _serializer(salt).loads(cursor)
+    except BadSignature:
+        return None
+    return payload if isinstance(payload, dict) else None
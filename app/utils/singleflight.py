@@ -0,0 +1,74 @@
+"""
+Coalescencia de llamadas concurrentes idénticas (single-flight)
+Mientras una llamada con cierta clave está en curso, las demás peticiones
+con la misma clave esperan su resultado en lugar de repetirla
+"""
+import threading
+
+
+class SingleFlightTimeout(Exception):
+    """Se agotó el tiempo de espera por el resultado de la llamada en curso"""
+
+
+class _Call:
+    """Llamada en curso compartida por todos los que esperan la misma clave"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas por clave dentro del proceso
+    El primer hilo ejecuta la función; el resto recibe el mismo resultado o excepción
+    """
+
+    def __init__(self, timeout=15):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'executed': 0,
+            'coalesced': 0,
+            'timeouts': 0,
+        }
+
+    def do(self, key, fn, timeout=None):
+        """Ejecuta fn() una sola vez por clave entre todos los hilos concurrentes"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['executed'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+                return call.result
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+
+        if not call.done.wait(timeout if timeout is not None else self.timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise SingleFlightTimeout(f'Tiempo de espera agotado para la clave {key}')
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        """Llamadas ejecutadas, coalescidas y esperas agotadas"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
@@ -0,0 +1,62 @@
+"""
+Utilidad para enviar páginas HTML en streaming
+La parte de la página anterior a {{ stream_flush }} (head, CSS, navbar y
+formulario de búsqueda) se envía en cuanto se genera; el resto se genera
+después y puede depender de llamadas lentas (por ejemplo a la API de
+YouTube) que la plantilla hace a través de una función diferida. Así el
+navegador descarga los estáticos mientras el servidor espera los datos
+
+Las plantillas siguen funcionando con render_template: sin streaming,
+stream_flush no está definido y se muestra vacío
+
+La cookie de sesión se guarda antes de generar el cuerpo, así que los
+mensajes flash se leen (y se quitan de la sesión) antes de empezar y llegan
+a la plantilla ya resueltos en flashed_messages
+"""
+from flask import Response, stream_template, get_flashed_messages
+from markupsafe import Markup
+
+# Comentario HTML inofensivo que marca dónde vaciar el buffer
+FLUSH_MARK = Markup('<!--flush-->')
+
+
+def _buffered(chunks):
+    """Agrupa los fragmentos de Jinja y los envía solo en cada marca y al final"""
+    buffer = []
+    for chunk in chunks:
+        buffer.append(chunk)
+        if chunk == FLUSH_MARK:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_page(template_name, **context):
+    """
+    Response en streaming de la plantilla
+    El contexto de la petición se conserva durante toda la generación
+    (stream_template usa stream_with_context)
+    """
+    flashed_messages = get_flashed_messages(with_categories=True)
+    chunks = stream_template(template_name, stream_flush=FLUSH_MARK, flashed_messages=flashed_messages, **context)
+    response = Response(_buffered(chunks), mimetype='text/html')
+    # Evita que un proxy intermedio (nginx) acumule la respuesta completa
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def deferred(loader, **fallback):
+    """
+    Envuelve la función que carga los datos dentro de la plantilla
+    Cuando se ejecuta ya se envió un 200 con la cabecera de la página, así
+    que un error no puede llegar al manejador de 500: se registra y la
+    plantilla recibe fallback con load_error=True para mostrar un aviso
+    """
+    def load():
+        try:
+            return loader()
+        except Exception as e:
+            print(f"Error cargando datos de la página: {e}")
+            return dict(fallback, load_error=True)
+    return load
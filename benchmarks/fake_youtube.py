@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita la API de datos de YouTube (v3) para benchmarks
+
+Sirve /youtube/v3/search y /youtube/v3/videos con cuerpos con la forma de
+los reales (snippet completo, miniaturas, estadísticas y duración), ETag
+por contenido con respuestas 304, y latencia y tasa de errores configurables.
+Los resultados son deterministas por consulta y página, así que las mismas
+búsquedas devuelven los mismos videos (como el caché espera en producción)
+
+No aplica el parámetro fields: los cuerpos son los completos, algo más
+grandes que los que recibe la app en producción
+
+Uso:
+    python benchmarks/fake_youtube.py [--port 8765] [--latency-ms 80] [--jitter-ms 40] [--error-rate 0.01]
+    YOUTUBE_API_BASE=http://127.0.0.1:8765/youtube/v3
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+WORDS = ('tutorial', 'curso', 'completo', 'desde', 'cero', 'avanzado', 'proyecto', 'práctico',
+         'guía', 'rápida', 'explicado', 'ejemplos', 'principiantes', 'parte', 'nuevo')
+CHANNELS = ('Código Fácil', 'Dev Academy', 'Programación ATS', 'MiduDev', 'Fazt', 'Hola Mundo')
+
+
+def _seeded(*parts):
+    return random.Random(hashlib.sha256('|'.join(map(str, parts)).encode('utf-8')).digest())
+
+
+def video_id_for(query, index):
+    """ID de 11 caracteres como los de YouTube, estable por consulta y posición"""
+    digest = hashlib.sha256(f'{query}|{index}'.encode('utf-8')).digest()
+    return base64.urlsafe_b64encode(digest).decode('ascii')[:11]
+
+
+def _thumbnails(video_id):
+    base = f'https://i.ytimg.com/vi/{video_id}'
+    return {
+        'default': {'url': f'{base}/default.jpg', 'width': 120, 'height': 90},
+        'medium': {'url': f'{base}/mqdefault.jpg', 'width': 320, 'height': 180},
+        'high': {'url': f'{base}/hqdefault.jpg', 'width': 480, 'height': 360},
+    }
+
+
+def _snippet(video_id, title_seed):
+    rng = _seeded('snippet', video_id)
+    channel = rng.choice(CHANNELS)
+    published = (datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 900000))).strftime('%Y-%m-%dT%H:%M:%SZ')
+    words = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 7)))
+    description = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 60)))
+    return {
+        'publishedAt': published,
+        'channelId': 'UC' + video_id_for(channel, 0) * 2,
+        'title': f'{title_seed} {words}'.strip()[:100],
+        'description': description,
+        'thumbnails': _thumbnails(video_id),
+        'channelTitle': channel,
+        'liveBroadcastContent': 'none',
+        'publishTime': published,
+    }
+
+
+def search_body(params):
+    query = params.get('q', [''])[0] or params.get('videoCategoryId', [''])[0]
+    max_results = min(int(params.get('maxResults', ['5'])[0]), 50)
+    token = params.get('pageToken', [''])[0]
+    start = int(token) if token.isdigit() else 0
+    filters = '|'.join(params.get(key, [''])[0] for key in ('order', 'videoDuration', 'publishedAfter'))
+
+    items = []
+    for index in range(start, start + max_results):
+        video_id = video_id_for(query + filters, index)
+        items.append({
+            'kind': 'youtube#searchResult',
+            'etag': hashlib.md5(video_id.encode('ascii')).hexdigest()[:27],
+            'id': {'kind': 'youtube#video', 'videoId': video_id},
+            'snippet': _snippet(video_id, query),
+        })
+    body = {
+        'kind': 'youtube#searchListResponse',
+        'nextPageToken': str(start + max_results),
+        'regionCode': 'ES',
+        'pageInfo': {'totalResults': 1000000, 'resultsPerPage': max_results},
+        'items': items,
+    }
+    if start:
+        body['prevPageToken'] = str(max(0, start - max_results))
+    return body
+
+
+def videos_body(params):
+    items = []
+    for video_id in filter(None, params.get('id', [''])[0].split(',')):
+        rng = _seeded('stats', video_id)
+        views = rng.randint(100, 5000000)
+        items.append({
+            'kind': 'youtube#video',
+            'etag': hashlib.md5(video_id.encode('ascii')).hexdigest()[:27],
+            'id': video_id,
+            'snippet': _snippet(video_id, ''),
+            'contentDetails': {
+                'duration': f'PT{rng.randint(0, 2)}H{rng.randint(0, 59)}M{rng.randint(0, 59)}S',
+                'dimension': '2d', 'definition': 'hd', 'caption': 'false',
+            },
+            'statistics': {
+                'viewCount': str(views),
+                'likeCount': str(views // rng.randint(20, 60)),
+                'favoriteCount': '0',
+                'commentCount': str(views // rng.randint(200, 900)),
+            },
+        })
+    return {'kind': 'youtube#videoListResponse', 'pageInfo': {'totalResults': len(items), 'resultsPerPage': len(items)},
+            'items': items}
+
+
+class FakeYouTube:
+    """Servidor en un hilo propio; start() retorna la URL base para YOUTUBE_API_BASE"""
+
+    def __init__(self, port=0, latency_ms=80, jitter_ms=40, error_rate=0.0, seed=None):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.stats = {'search': 0, 'videos': 0, 'not_modified': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self._server.server_port}/youtube/v3'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-youtube', daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _delay(self):
+        with self._lock:
+            delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+            failed = self.random.random() < self.error_rate
+        time.sleep(max(0.0, delay))
+        return failed
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+                if endpoint not in ('search', 'videos'):
+                    return self._send(404, {'error': {'code': 404, 'message': 'Not Found'}})
+
+                if fake._delay():
+                    fake._count('errors')
+                    return self._send(503, {'error': {'code': 503, 'message': 'Backend Error',
+                                                      'errors': [{'reason': 'backendError'}]}})
+
+                fake._count(endpoint)
+                params = parse_qs(url.query)
+                body = search_body(params) if endpoint == 'search' else videos_body(params)
+                raw = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                etag = hashlib.md5(raw).hexdigest()
+                body['etag'] = etag
+                if self.headers.get('If-None-Match', '').strip('"') == etag:
+                    fake._count('not_modified')
+                    self.send_response(304)
+                    self.send_header('ETag', f'"{etag}"')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self._send(200, body, etag)
+
+            def _send(self, status, body, etag=None):
+                raw = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(raw)))
+                if etag:
+                    self.send_header('ETag', f'"{etag}"')
+                self.end_headers()
+                self.wfile.write(raw)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--jitter-ms', type=float, default=40)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeYouTube(args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+    print(f'API falsa de YouTube en {fake.start()}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark del almacén de límites compartido (app/utils/limiter_storage.py)
+
+Mide el coste por comprobación de la estrategia moving-window con el
+almacén en memoria y con el de SQLite, y comprueba que varios procesos
+contra el mismo archivo no admiten más peticiones que el límite
+
+Uso:
+    python benchmarks/limiter_storage.py [--checks 20000] [--workers 4]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import MovingWindowRateLimiter
+
+from app.utils import limiter_storage  # noqa: F401 (registra el esquema sqlite://)
+
+
+def measure(uri, checks, keys):
+    """Microsegundos por hit() y por test() repartidos entre varias claves"""
+    limiter = MovingWindowRateLimiter(storage_from_string(uri))
+    limit = parse('50 per hour')
+
+    started = time.perf_counter()
+    for i in range(checks):
+        limiter.hit(limit, f'ip-{i % keys}')
+    hit_us = (time.perf_counter() - started) / checks * 1e6
+
+    started = time.perf_counter()
+    for i in range(checks):
+        limiter.test(limit, f'ip-{i % keys}')
+    test_us = (time.perf_counter() - started) / checks * 1e6
+    return {'hit_us': round(hit_us, 2), 'test_us': round(test_us, 2)}
+
+
+def _hammer(args):
+    uri, attempts = args
+    limiter = MovingWindowRateLimiter(storage_from_string(uri))
+    limit = parse('100 per minute')
+    return sum(1 for _ in range(attempts) if limiter.hit(limit, 'shared'))
+
+
+def contention(uri, workers, attempts):
+    """Peticiones admitidas cuando varios procesos compiten por la misma clave"""
+    with Pool(workers) as pool:
+        admitted = sum(pool.map(_hammer, [(uri, attempts)] * workers))
+    return {'workers': workers, 'attempts': workers * attempts, 'admitted': admitted, 'limit': 100}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checks', type=int, default=20000)
+    parser.add_argument('--keys', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_uri = 'sqlite:///' + os.path.join(tmp, 'ratelimit.db')
+        results = {
+            'memory': measure('memory://', args.checks, args.keys),
+            'sqlite': measure(sqlite_uri, args.checks, args.keys),
+            'contention': contention('sqlite:///' + os.path.join(tmp, 'contention.db'), args.workers, 200),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
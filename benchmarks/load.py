@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de TUT0hub contra la API falsa de YouTube
+
+Arranca create_app en este proceso (servidor WSGI con hilos de werkzeug),
+con base de datos y almacenes en un directorio temporal, y una API falsa
+local (benchmarks/fake_youtube.py). Varios usuarios virtuales, cada uno con
+su sesión HTTP, repiten una mezcla ponderada de rutas durante el tiempo
+indicado. El resultado es un JSON con throughput y latencias p50/p95/p99
+por ruta, pensado para guardarse como línea base y compararse después:
+
+    python benchmarks/load.py --duration 30 --concurrency 8 --output baseline.json
+    python benchmarks/load.py --duration 30 --concurrency 8 --baseline baseline.json
+
+Con --baseline el proceso termina con código 1 si el p95 de alguna ruta
+empeora más que --tolerance (20 % por defecto)
+
+CSRF y los límites de peticiones se desactivan: se mide el coste de las
+rutas, no de las defensas. BCRYPT_ROUNDS es 4 salvo que se indique otro
+"""
+import argparse
+import contextlib
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from werkzeug.serving import make_server
+
+from fake_youtube import FakeYouTube, video_id_for
+
+DEFAULT_MIX = 'login=5,dashboard=20,search=30,advanced_search=10,toggle_favorite=15,favorites=20'
+
+QUERIES = ('python', 'javascript', 'flask', 'django', 'react', 'sql', 'docker', 'git',
+           'css grid', 'rust', 'go', 'kubernetes', 'linux', 'java', 'typescript', 'vue')
+
+PASSWORD = 'benchmark-password'
+
+
+# ==========================
+# Entorno
+# ==========================
+def build_app(workdir, api_base, bcrypt_rounds):
+    """create_app con todos los archivos bajo workdir y sin CSRF ni límites"""
+    os.environ.update({
+        'SECRET_KEY': 'benchmark',
+        'DATABASE_URL': 'sqlite:///' + os.path.join(workdir, 'tut0hub.db'),
+        'YOUTUBE_CACHE_DB': os.path.join(workdir, 'youtube_cache.db'),
+        'VIDEO_INDEX_DB': os.path.join(workdir, 'video_index.db'),
+        'RATELIMIT_STORAGE_URI': 'memory://',
+        'YOUTUBE_API_KEY': 'benchmark',
+        'YOUTUBE_API_BASE': api_base,
+        'YOUTUBE_DAILY_QUOTA': '100000000',
+        'YOUTUBE_MAX_QPS': '10000',
+        'YOUTUBE_QPS_BURST': '10000',
+        'BCRYPT_ROUNDS': str(bcrypt_rounds),
+    })
+
+    from app import create_app, limiter
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    limiter.enabled = False
+    return app
+
+
+def create_users(app, count):
+    from app import db
+    from app.models.user import User
+
+    with app.app_context():
+        for index in range(count):
+            user = User(username=f'bench{index}', email=f'bench{index}@tut0hub.test')
+            user.set_password(PASSWORD)
+            db.session.add(user)
+        db.session.commit()
+
+
+# ==========================
+# Usuario virtual
+# ==========================
+class VirtualUser:
+    """Sesión HTTP propia (cookies) que ejecuta operaciones de la mezcla"""
+
+    def __init__(self, base_url, index, rng):
+        self.base_url = base_url
+        self.username = f'bench{index}'
+        self.rng = rng
+        self.session = requests.Session()
+
+    def _get(self, path, **params):
+        return self.session.get(self.base_url + path, params=params, allow_redirects=False)
+
+    def login(self):
+        self._get('/auth/logout')
+        return self.session.post(self.base_url + '/auth/login', allow_redirects=False,
+                                 data={'username': self.username, 'password': PASSWORD})
+
+    def dashboard(self):
+        return self._get('/dashboard')
+
+    def search(self):
+        return self._get('/search/', q=self.rng.choice(QUERIES))
+
+    def advanced_search(self):
+        return self._get('/search/advanced', q=self.rng.choice(QUERIES).replace(' ', ''),
+                         order=self.rng.choice(('relevance', 'date', 'viewCount')),
+                         duration=self.rng.choice(('', 'short', 'medium')))
+
+    def toggle_favorite(self):
+        # Videos que también aparecen en las búsquedas, para que favoritos y resultados se crucen
+        video_id = video_id_for(self.rng.choice(QUERIES) + '||', self.rng.randrange(24))
+        return self.session.post(f'{self.base_url}/toggle-favorite/{video_id}',
+                                 json={'title': f'Video {video_id}', 'channel': 'Benchmark',
+                                       'description': '', 'thumbnail': ''})
+
+    def favorites(self):
+        return self._get('/favorites')
+
+
+def run_user(user, operations, weights, deadline, samples):
+    login = user.login()
+    if login.status_code >= 400:
+        samples.append(('login', 0.0, False))
+        return
+    while time.perf_counter() < deadline:
+        name = user.rng.choices(operations, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = getattr(user, name)()
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        samples.append((name, time.perf_counter() - started, ok))
+
+
+# ==========================
+# Informe
+# ==========================
+def percentile(values, pct):
+    """Percentil por rango más cercano de una lista ordenada"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[rank]
+
+
+def summarize(samples, elapsed):
+    by_route = {}
+    for name, seconds, ok in samples:
+        by_route.setdefault(name, []).append((seconds, ok))
+    by_route['total'] = [(seconds, ok) for _, seconds, ok in samples]
+
+    routes = {}
+    for name, values in sorted(by_route.items()):
+        latencies = sorted(seconds * 1000 for seconds, _ in values)
+        routes[name] = {
+            'requests': len(values),
+            'errors': sum(1 for _, ok in values if not ok),
+            'rps': round(len(values) / elapsed, 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'max_ms': round(latencies[-1], 2) if latencies else 0.0,
+        }
+    return routes
+
+
+def compare(routes, baseline, tolerance):
+    """Rutas cuyo p95 empeoró más que la tolerancia respecto a la línea base"""
+    regressions = []
+    for name, current in routes.items():
+        previous = baseline.get('routes', {}).get(name)
+        if previous and previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append({'route': name, 'baseline_p95_ms': previous['p95_ms'], 'p95_ms': current['p95_ms']})
+    return regressions
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if not hasattr(VirtualUser, name.strip()):
+            raise SystemExit(f'Operación desconocida en --mix: {name}')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=20, help='segundos de carga medida')
+    parser.add_argument('--concurrency', type=int, default=8, help='usuarios virtuales simultáneos')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='operaciones y pesos (ruta=peso,...)')
+    parser.add_argument('--latency-ms', type=float, default=80, help='latencia media de la API falsa')
+    parser.add_argument('--jitter-ms', type=float, default=40)
+    parser.add_argument('--error-rate', type=float, default=0.01, help='fracción de respuestas 503 de la API falsa')
+    parser.add_argument('--bcrypt-rounds', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='archivo donde guardar el JSON (además de imprimirlo)')
+    parser.add_argument('--baseline', help='JSON de una ejecución anterior con el que comparar')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    fake = FakeYouTube(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                       error_rate=args.error_rate, seed=args.seed)
+    api_base = fake.start()
+
+    # stdout queda solo para el JSON: los mensajes de la app (arranque y
+    # errores durante la carga) van a stderr
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(sys.stderr):
+        app = build_app(workdir, api_base, args.bcrypt_rounds)
+        create_users(app, args.concurrency)
+
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, name='wsgi', daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+        samples = []
+        deadline = time.perf_counter() + args.duration
+        threads = [
+            threading.Thread(target=run_user, args=(VirtualUser(base_url, index, random.Random(args.seed + index)),
+                                                    list(mix), list(mix.values()), deadline, samples))
+            for index in range(args.concurrency)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        server.shutdown()
+        fake.stop()
+
+    result = {
+        'config': {
+            'duration_s': args.duration,
+            'concurrency': args.concurrency,
+            'mix': mix,
+            'upstream_latency_ms': args.latency_ms,
+            'upstream_jitter_ms': args.jitter_ms,
+            'upstream_error_rate': args.error_rate,
+            'bcrypt_rounds': args.bcrypt_rounds,
+            'python': sys.version.split()[0],
+            'cpus': os.cpu_count(),
+        },
+        'elapsed_s': round(elapsed, 2),
+        'upstream_calls': fake.stats,
+        'routes': summarize(samples, elapsed),
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            result['regressions'] = compare(result['routes'], json.load(f), args.tolerance)
+        exit_code = 1 if result['regressions'] else 0
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
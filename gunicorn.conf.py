@@ -0,0 +1,81 @@
+"""
+Configuración de gunicorn para producción
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+- Pool de procesos pre-fork con hilos por worker (gthread), dimensionado a
+  partir de los núcleos; WEB_CONCURRENCY y GUNICORN_THREADS lo sobrescriben
+- preload_app: la app se importa y se calienta una sola vez en el maestro y
+  los workers la comparten por copy-on-write
+- Reinicio ordenado: kill -HUP <maestro> sustituye los workers terminando
+  antes las peticiones en curso; para desplegar código nuevo (con preload la
+  app no se vuelve a importar con HUP) se usa kill -USR2 y después -QUIT al
+  maestro anterior
+- max_requests recicla cada worker periódicamente, con jitter para que no
+  se reinicien todos a la vez
+
+Todos los valores aceptan variables de entorno GUNICORN_*
+"""
+import gc
+import multiprocessing
+import os
+
+# Los hilos no sobreviven al fork: el refresco de tendencias se arranca en cada
+# worker (post_fork) y no en el maestro al importar la app
+os.environ.setdefault('TRENDING_REFRESH_AUTOSTART', '0')
+
+cores = multiprocessing.cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', cores * 2 + 1))
+# Las peticiones pasan la mayor parte del tiempo esperando a la API de YouTube
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    """Maestro listo y antes de crear los workers: calentar y congelar el heap"""
+    from wsgi import app
+    from app.services.warmup import warm_up
+
+    timings = warm_up(app)
+    server.log.info('Calentamiento: ' + ', '.join(f'{k} {v * 1000:.0f} ms' for k, v in timings.items()))
+    # Los objetos creados hasta aquí no los recorre el GC de los workers, así
+    # que sus páginas de memoria no se copian al actualizar contadores de referencias
+    gc.freeze()
+    server.log.info(f'{workers} workers x {threads} hilos ({cores} núcleos)')
+
+
+def post_fork(server, worker):
+    """Recursos por proceso en cada worker nuevo"""
+    from wsgi import app
+    from app import db
+    from app.services.trending_service import trending_refresher
+
+    with app.app_context():
+        # Conexiones heredadas del maestro: se descartan sin cerrarlas
+        db.engine.dispose(close=False)
+    if trending_refresher.enabled:
+        trending_refresher.start()
+
+
+def worker_exit(server, worker):
+    """Worker saliendo (reciclado o parada): publicar sus últimos contadores"""
+    from app.services.metrics import metrics
+    metrics.retire()
+
+
+def worker_int(worker):
+    """Ctrl+C o SIGINT en un worker: detener el hilo de refresco"""
+    from app.services.trending_service import trending_refresher
+    trending_refresher.stop()
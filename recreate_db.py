@@ -1,39 +1,42 @@
 #!/usr/bin/env python3
-"""Script para recrear la base de datos con el nuevo esquema"""
+"""
+Script para actualizar la base de datos al esquema actual
+Por defecto aplica las migraciones pendientes conservando los datos;
+con --reset elimina la base de datos y la crea desde cero
+"""
 
 import os
 import sys
 
 def main():
-    db_path = r"C:\Users\lujan\Downloads\Desarrollo Pagina\TUT0hub_clean\instance\tut0hub.db"
-    
-    # Eliminar BD antigua
-    try:
-        if os.path.exists(db_path):
-            os.remove(db_path)
-            print(f"✅ Base de datos eliminada: {db_path}")
-        else:
-            print(f"ℹ️ Base de datos no existe")
-    except Exception as e:
-        print(f"❌ Error al eliminar BD: {e}")
-        return False
-    
-    # Cambiar directorio
-    os.chdir(r"C:\Users\lujan\Downloads\Desarrollo Pagina\TUT0hub_clean")
-    sys.path.insert(0, os.getcwd())
-    
-    # Importar y recrear
+    reset = '--reset' in sys.argv[1:]
+
+    # Ejecutar desde la carpeta del proyecto
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(project_dir)
+    sys.path.insert(0, project_dir)
+
     try:
         from app import create_app, db
-        
+        from app.models.migrations import run_migrations, MIGRATIONS
+
+        # Sin arrancar el refresco de tendencias para una tarea de mantenimiento
+        os.environ.setdefault('TRENDING_REFRESH_INTERVAL', '0')
         app = create_app()
         with app.app_context():
-            db.create_all()
-            print("✅ Base de datos recreada con las nuevas columnas")
-            print("✅ Listo para registrarse de nuevo")
+            if reset:
+                db_path = db.engine.url.database
+                db.engine.dispose()
+                for path in (db_path, db_path + '-wal', db_path + '-shm'):
+                    if path and os.path.exists(path):
+                        os.remove(path)
+                print(f"✅ Base de datos eliminada: {db_path}")
+                run_migrations()
+
+            print(f"✅ Esquema al día (versión {MIGRATIONS[-1][0]})")
             return True
     except Exception as e:
-        print(f"❌ Error al recrear BD: {e}")
+        print(f"❌ Error al migrar BD: {e}")
         import traceback
         traceback.print_exc()
         return False
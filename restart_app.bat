@@ -1,5 +1,5 @@
 @echo off
-REM Script para detener Flask, eliminar BD y reiniciar
+REM Script para detener Flask, migrar la BD y reiniciar
 
 echo Deteniendo Flask...
 taskkill /F /IM python.exe 2>nul
@@ -7,10 +7,7 @@ taskkill /F /IM python.exe 2>nul
 echo Esperando...
 timeout /t 2
 
-echo Eliminando BD antigua...
-del "C:\Users\lujan\Downloads\Desarrollo Pagina\TUT0hub_clean\instance\tut0hub.db" 2>nul
-
-echo Recreando BD...
+echo Aplicando migraciones de la BD...
 cd "C:\Users\lujan\Downloads\Desarrollo Pagina\TUT0hub_clean"
 python recreate_db.py
 
@@ -1,3 +1,10 @@
+"""
+Servidor de desarrollo (un proceso, recarga automática y depurador)
+    python run.py
+
+En producción se usa gunicorn con varios workers:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
 from app import create_app
 
 app = create_app()
@@ -9,6 +16,7 @@ if __name__ == '__main__':
     print("Modo: Desarrollo")
     print("Puerto: 5000")
     print("URL: http://localhost:5000")
+    print("Producción: gunicorn -c gunicorn.conf.py wsgi:app")
     print("=" * 50)
-    
-    app.run(debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
+
+    app.run(debug=True, port=5000, host='0.0.0.0')
@@ -0,0 +1,121 @@
+// ============================================
+// SISTEMA DE FAVORITOS
+// Los clics se aplican al instante en la interfaz y se acumulan en una cola;
+// tras una pausa se envían todos juntos a /favorites/batch (una transacción)
+// ============================================
+(function () {
+    const csrfToken = document.currentScript.dataset.csrfToken;
+    const DEBOUNCE_MS = 700;     // pausa sin clics antes de enviar
+    const MAX_WAIT_MS = 3000;    // espera máxima con clics continuos
+    const MAX_BATCH = 100;       // debe coincidir con FAVORITES_BATCH_MAX
+
+    const confirmed = {};        // video_id -> estado guardado en el servidor
+    const pending = new Map();   // video_id -> operación aún no enviada
+    let timer = null;
+    let firstQueuedAt = null;
+    let inFlight = false;
+
+    function buttonsFor(videoId) {
+        return document.querySelectorAll(`.favorite-btn[data-video-id="${CSS.escape(videoId)}"]`);
+    }
+
+    function render(videoId, isActive) {
+        buttonsFor(videoId).forEach(btn => {
+            btn.classList.toggle('active', isActive);
+            btn.textContent = isActive ? '★' : '☆';
+            btn.title = isActive ? 'Quitar de favoritos' : 'Agregar a favoritos';
+        });
+    }
+
+    function enqueue(btn) {
+        const videoId = btn.dataset.videoId;
+        const isActive = !btn.classList.contains('active');
+        render(videoId, isActive);
+
+        // Dos clics seguidos sobre el mismo video se anulan entre sí
+        if (isActive === confirmed[videoId]) {
+            pending.delete(videoId);
+        } else {
+            pending.set(videoId, {
+                video_id: videoId,
+                action: isActive ? 'add' : 'remove',
+                title: btn.dataset.title,
+                channel: btn.dataset.channel,
+                description: btn.dataset.description,
+                thumbnail: btn.dataset.thumbnail
+            });
+        }
+        schedule();
+    }
+
+    function schedule() {
+        clearTimeout(timer);
+        if (!pending.size) {
+            firstQueuedAt = null;
+            return;
+        }
+        firstQueuedAt = firstQueuedAt || Date.now();
+        const wait = Math.min(DEBOUNCE_MS, Math.max(0, firstQueuedAt + MAX_WAIT_MS - Date.now()));
+        timer = setTimeout(flush, wait);
+    }
+
+    async function flush(keepalive = false) {
+        clearTimeout(timer);
+        if (!pending.size || (inFlight && !keepalive)) {
+            return;
+        }
+
+        const ops = Array.from(pending.values()).slice(0, MAX_BATCH);
+        ops.forEach(op => pending.delete(op.video_id));
+        firstQueuedAt = null;
+        inFlight = true;
+
+        try {
+            const response = await fetch('/favorites/batch', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': csrfToken
+                },
+                body: JSON.stringify({ ops }),
+                keepalive
+            });
+            if (!response.ok) {
+                throw new Error(`Error en la respuesta: ${response.status}`);
+            }
+            const data = await response.json();
+            Object.entries(data.favorites).forEach(([videoId, isActive]) => {
+                confirmed[videoId] = isActive;
+            });
+        } catch (error) {
+            console.error('Error al guardar favoritos:', error);
+            // Se vuelve al último estado guardado de los videos que no tienen clics nuevos
+            ops.forEach(op => {
+                if (!pending.has(op.video_id)) {
+                    render(op.video_id, confirmed[op.video_id]);
+                }
+            });
+            alert('Error al actualizar favoritos. Intenta de nuevo.');
+        } finally {
+            inFlight = false;
+            schedule();
+        }
+    }
+
+    document.querySelectorAll('.favorite-btn').forEach(btn => {
+        confirmed[btn.dataset.videoId] = btn.classList.contains('active');
+        btn.addEventListener('click', function (e) {
+            e.preventDefault();
+            e.stopPropagation();
+            enqueue(this);
+        });
+    });
+
+    // No perder clics pendientes al salir de la página
+    window.addEventListener('pagehide', () => flush(true));
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') {
+            flush(true);
+        }
+    });
+})();
@@ -0,0 +1,9 @@
+"""
+Punto de entrada WSGI para producción
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Para desarrollo se sigue usando run.py (servidor de Flask con recarga)
+"""
+from app import create_app
+
+app = create_app()